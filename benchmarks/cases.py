@@ -0,0 +1,284 @@
+import ast, hashlib, heapq, importlib, importlib.util, os, sys
+from collections import Counter
+
+import numpy as np
+
+"""
+Benchmark cases. Every case has a list of input sizes and three functions:
+setup(size) -> data        builds the input (not timed)
+run(data) -> result        the timed call
+check(data, result) -> bool correctness oracle (hashlib, known tables or reference values)
+Sizes listed in known fail on the current code for a documented reason. They are still run and
+reported as known-wrong, so a fix shows up as ok, but they do not fail the run.
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports a module of a lab directory, main.py files get unique names (lab1_main, lab2_main, ...)
+def loadModule(lab: str, name: str):
+    directory = os.path.join(ROOT, lab)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    if name != 'main':
+        return importlib.import_module(name)
+
+    moduleName = lab + '_main'
+    if moduleName not in sys.modules:
+        spec = importlib.util.spec_from_file_location(moduleName, os.path.join(directory, 'main.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[moduleName] = module
+        spec.loader.exec_module(module)
+    return sys.modules[moduleName]
+
+
+class Case:
+    def __init__(self, name: str, sizes: list, setup, run, check, unit: str = None, known: dict = None):
+        self.name = name
+        self.sizes = sizes
+        self.setup = setup
+        self.run = run
+        self.check = check
+        self.unit = unit
+        self.known = known or {}
+
+
+# lab1 -------------------------------------------------------------------------------------------
+
+IRREDUCIBLE = {8: 0x11B, 10: 0x409, 12: 0x1053}
+
+# Multiplication in GF(2^n) for whole arrays
+def gfMultiply(a: np.ndarray, b: np.ndarray, n: int) -> np.ndarray:
+    result = np.zeros_like(a)
+    a, b = a.copy(), b.copy()
+    for _ in range(n):
+        result ^= np.where(b & 1, a, 0)
+        b >>= 1
+        a <<= 1
+        a ^= np.where(a >> n, IRREDUCIBLE[n], 0)
+    return result
+
+# Inverse function x -> x^(2^n - 2) in GF(2^n): NL 2^(n-1) - 2^(n/2), differential uniformity 4, degree n - 1
+def inverseSbox(n: int):
+    sbox = loadModule('lab1', 'sbox')
+    x = np.arange(1 << n, dtype=np.int64)
+    result, power, exponent = np.ones_like(x), x.copy(), (1 << n) - 2
+    while exponent:
+        if exponent & 1:
+            result = gfMultiply(result, power, n)
+        power = gfMultiply(power, power, n)
+        exponent >>= 1
+    return sbox.Sbox(result.astype(np.uint16 if n > 8 else np.uint8), n)
+
+def lab1Cases() -> list:
+    walsh = loadModule('lab1', 'walsh')
+    differential = loadModule('lab1', 'differential')
+    avalanche = loadModule('lab1', 'avalanche')
+    anf = loadModule('lab1', 'anf')
+    bits = [8, 10, 12]
+
+    def sacCheck(sbox, result):
+        sac, bic = result
+        return sac.shape == (sbox.inputBits, sbox.outputBits) and bool(((sac > 0) & (sac < 1)).all()) \
+            and bool((bic == bic.T).all())
+
+    return [
+        Case('lab1.nonLinearity', bits, inverseSbox, walsh.analyzeComponents,
+             lambda sbox, r: r['nonLinearity'] == (1 << (sbox.inputBits - 1)) - (1 << (sbox.inputBits // 2))),
+        Case('lab1.ddt', bits, inverseSbox, differential.differenceDistributionTable,
+             lambda sbox, ddt: differential.differentialUniformity(ddt) == 4 and bool((ddt.sum(axis=1) == sbox.size).all())),
+        Case('lab1.sacBic', bits, inverseSbox,
+             lambda sbox: (avalanche.sacMatrix(sbox.bitPlanes()), avalanche.bicMatrix(sbox.bitPlanes())), sacCheck),
+        Case('lab1.degree', bits, inverseSbox, lambda sbox: anf.analyzeAlgebraic(sbox, sbox.bitPlanes()),
+             lambda sbox, r: r['degree'] == sbox.inputBits - 1),
+    ]
+
+
+# lab2 -------------------------------------------------------------------------------------------
+
+# Reference DDTs are the TDR.txt files committed next to lab2/main.py
+def knownDdts() -> list:
+    tables = []
+    for number in range(1, 9):
+        with open(os.path.join(ROOT, 'lab2', 'SBOX{}'.format(number), 'TDR.txt')) as f:
+            tables.append([ast.literal_eval(line) for line in f if line.strip()])
+    return tables
+
+def lab2Cases() -> list:
+    lab2 = loadModule('lab2', 'main')
+    reference = knownDdts()
+
+    def sboxes(count):
+        return lab2.readSbox(os.path.join(ROOT, 'lab2', 'sboxes.txt'))[:count]
+
+    def tables(boxes):
+        return [lab2.generateTables(sbox) for sbox in boxes]
+
+    # The TDRs match the committed ones and the saved tables load back memory-mapped unchanged
+    def tablesCheck(boxes, result):
+        for sbox, (tdr, tzp) in zip(boxes, result):
+            loadedTdr, loadedTzp = lab2.loadTables(sbox)
+            if not isinstance(loadedTzp.pairs, np.memmap) or loadedTdr.tolist() != tdr:
+                return False
+            if not (np.array_equal(loadedTzp.pairs, tzp.pairs) and np.array_equal(loadedTzp.offsets, tzp.offsets)):
+                return False
+        return all([list(row) for row in tdr] == reference[sbox.number - 1] for sbox, (tdr, _) in zip(boxes, result))
+
+    def keysSetup(count):
+        boxes = sboxes(count)
+        return [(sbox, lab2.generateTables(sbox)) for sbox in boxes]
+
+    def keys(data):
+        result = []
+        for _, (tdr, tzp) in data:
+            row = lab2.highestPairIndexes(tdr, 5)
+            result.append((row, lab2.getKeys(lab2.pairFromIndex(tzp, row), row)))
+        return result
+
+    def keysCheck(data, result):
+        for (_, (tdr, _)), (row, ranking) in zip(data, result):
+            if sum(ranking.values()) != sum(tdr[r[0]][r[1]] for r in row):
+                return False
+            counts = list(ranking.values())
+            if counts != sorted(counts, reverse=True):
+                return False
+        return True
+
+    linear = loadModule('lab2', 'linear')
+
+    # LAT[a][b] counted directly, a.x = b.S(x) for every x
+    def latCheck(boxes, lats):
+        x = np.arange(64)
+        parity = lambda v: np.array([bin(int(e)).count('1') & 1 for e in v])
+        for sbox, lat in zip(boxes, lats):
+            for a in range(64):
+                inputs = parity(a & x)
+                for b in range(16):
+                    if lat[a][b] != int(np.count_nonzero(inputs == parity(b & sbox.table.astype(np.int64)))) - 32:
+                        return False
+        return True
+
+    return [
+        Case('lab2.tables', [1, 8], sboxes, tables, tablesCheck, unit='S-boxes'),
+        Case('lab2.keys', [1, 8], keysSetup, keys, keysCheck, unit='S-boxes'),
+        Case('lab2.lat', [1, 8], sboxes, linear.generateApproximationTables, latCheck, unit='S-boxes'),
+    ]
+
+
+# lab3 -------------------------------------------------------------------------------------------
+
+def lab3Cases() -> list:
+    lab3 = loadModule('lab3', 'main')
+    batch = loadModule('lab3', 'keccak_batch')
+    sp800 = loadModule('lab3', 'sp800_185')
+    reduced = loadModule('lab3', 'reduced_round')
+    collision = loadModule('lab3', 'collision')
+
+    def message(size):
+        rng = np.random.default_rng(size)
+        return bytes(rng.integers(ord('a'), ord('z') + 1, size, dtype=np.uint8)).decode('ascii')
+
+    # ParallelHash128 with the leaves hashed one by one by hashlib
+    def parallelHashCheck(data, digest):
+        n = (len(data) + 8191) // 8192
+        node = sp800.cshake_128(sp800.left_encode(8192), 'ParallelHash')
+        for start in range(0, len(data), 8192):
+            node.update(hashlib.shake_128(data[start:start + 8192]).digest(32))
+        node.update(sp800.right_encode(n) + sp800.right_encode(256))
+        return digest == node.digest(32)
+
+    # Two different messages whose SHA3-256 digests agree in the first bits
+    def collisionCheck(bits, found):
+        x, y = (value.to_bytes((bits + 7) // 8, 'little') for value in (found['x'], found['y']))
+        mask = (1 << bits) - 1
+        images = [int.from_bytes(hashlib.sha3_256(message).digest()[:8], 'little') & mask for message in (x, y)]
+        return x != y and images[0] == images[1]
+
+    # Short records of 8 to 64 bytes, hashed as one batch
+    def records(size):
+        rng = np.random.default_rng(size)
+        return [bytes(rng.integers(0, 256, length, dtype=np.uint8)) for length in rng.integers(8, 65, size)]
+
+    # Squeezes size bytes in 64 KiB reads
+    def keystream(size):
+        xof = lab3.shake_256(b'keystream')
+        return b''.join(xof.read(min(1 << 16, size - start)) for start in range(0, size, 1 << 16))
+
+    return [
+        Case('lab3.sha3_256', [0, 1 << 10, 1 << 16, 1 << 20], message, lab3.SHA3.sha3_256,
+             lambda text, digest: digest == hashlib.sha3_256(text.encode('ascii')).hexdigest(), unit='bytes'),
+        Case('lab3.hash_batch', [1 << 10, 1 << 14, 1 << 17], records, batch.hash_batch,
+             lambda messages, digests: all(bytes(digest) == hashlib.sha3_256(message).digest()
+                                           for message, digest in zip(messages, digests)), unit='messages'),
+        Case('lab3.parallel_hash', [1 << 16, 1 << 20, 1 << 23], lambda size: message(size).encode('ascii'),
+             lambda data: sp800.parallel_hash(data, 8192), parallelHashCheck, unit='bytes'),
+        Case('lab3.reduced_round', [1 << 10, 1 << 12, 1 << 14], lambda size: size,
+             lambda size: reduced.sweep([200], [1, 24], size, workers=1)[0],
+             lambda size, summaries: summaries[0]['distinguished'] and not summaries[1]['distinguished'], unit='states'),
+        Case('lab3.collision', [24, 28, 32], lambda bits: bits,
+             lambda bits: collision.search(bits, workers=1, memory=1 << 16)['collisions'][0], collisionCheck, unit='bits'),
+        Case('lab3.shake_256.read', [1 << 10, 1 << 16, 1 << 20], lambda size: size, keystream,
+             lambda size, output: output == hashlib.shake_256(b'keystream').digest(size), unit='bytes'),
+    ]
+
+
+# lecture ----------------------------------------------------------------------------------------
+
+PRIME_COUNTS = {10**3: 168, 10**4: 1229, 10**5: 9592, 10**6: 78498, 10**7: 664579, 10**8: 5761455}
+
+# Length of an optimal prefix code, the same for every Huffman tree of the text
+def huffmanLength(text: str) -> int:
+    heap = list(Counter(text).values())
+    if len(heap) == 1:
+        return 0
+    heapq.heapify(heap)
+    total = 0
+    while len(heap) > 1:
+        merged = heapq.heappop(heap) + heapq.heappop(heap)
+        total += merged
+        heapq.heappush(heap, merged)
+    return total
+
+# Polynomials g*a and g*b with a known monic gcd g of the given degree
+def polynomialPair(degree: int) -> tuple:
+    rng = np.random.default_rng(degree)
+    g = np.concatenate(([1], rng.integers(-3, 4, degree)))
+    a = np.concatenate(([1], rng.integers(-3, 4, degree)))
+    b = np.concatenate(([1], rng.integers(-3, 4, degree - 1)))
+    return list(np.polymul(g, a)), list(np.polymul(g, b)), g
+
+def polynomialCheck(data: tuple, result: list) -> bool:
+    g = data[2]
+    result = np.asarray(result, dtype=np.float64)
+    return len(result) == len(g) and bool(np.allclose(result / result[0], g, rtol=1e-6, atol=1e-6))
+
+def lectureCases() -> list:
+    functions = loadModule('lecture', 'functions')
+    huffman = loadModule('lecture', 'huffman')
+    polynomial = loadModule('lecture', 'polynomial_gcd')
+
+    def text(size):
+        rng = np.random.default_rng(size)
+        weights = 1 / np.arange(1, 61)
+        letters = np.array(list('etaoinshrdlcumwfgypbvkjxqzETAOINSHRDLCUMWFGYPBVKJXQZ .,;!?-\n'))
+        return ''.join(rng.choice(letters, size, p=weights / weights.sum()))
+
+    return [
+        # The baseline sieve removes composites from a list, so it is quadratic: n = 10^5 already takes
+        # 80 to 100 s, close to the default timeout, and larger n can never fit the budget. Sizes above
+        # 10^4 are not run so the result does not depend on the speed of the machine.
+        Case('lecture.sieve', [n for n in sorted(PRIME_COUNTS) if n <= 10**4], lambda n: n,
+             functions.sieve_of_eratosthenes,
+             lambda n, primes: len(primes) == PRIME_COUNTS[n], unit='n'),
+        Case('lecture.huffman', [1 << 10, 1 << 16, 1 << 20, 1 << 22], text, huffman.huffman,
+             lambda data, encoded: len(encoded) == huffmanLength(data), unit='characters'),
+        # The float Euclid in lecture/polynomial_gcd.py compares coefficients with 0 exactly. From degree 8 the
+        # rounding noise of the last remainder is returned as a degree 1 gcd, and at degree 32 the division loop
+        # never terminates, so sizes above 16 are not run.
+        Case('lecture.polynomial_gcd', [1, 2, 4, 8, 16], polynomialPair,
+             lambda data: polynomial.polynomial_gcd(data[0], data[1]), polynomialCheck, unit='degree',
+             known={8: 'rounding noise returned as the gcd', 16: 'rounding noise returned as the gcd'}),
+    ]
+
+
+def allCases() -> list:
+    return lab1Cases() + lab2Cases() + lab3Cases() + lectureCases()
@@ -0,0 +1,181 @@
+import argparse, json, os, platform, signal, statistics, subprocess, sys, tempfile, time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure
+
+import logging
+
+from cases import ROOT, allCases
+
+logger = logging.getLogger(__name__)
+
+"""
+Benchmark and regression runner.
+
+For every case the sizes are run in increasing order, each size `repeats` times.
+Every result is checked by the case oracle. A size whose first run takes longer than
+`budget` seconds ends the case and the remaining sizes are reported as skipped,
+a run longer than `timeout` seconds is interrupted.
+
+Results are written as JSON. With --compare, every size that is slower than the previous
+report by more than `tolerance` is reported as a regression; the exit code is 1 when a
+regression is found or a size is wrong, fails with an error or times out. A wrong result or a
+timeout at a size the case lists as known is reported as known-wrong and does not fail the run.
+"""
+
+
+# Statuses that make the run fail
+FAILED = {'wrong', 'error', 'timeout'}
+
+
+class RunTimeout(Exception):
+    pass
+
+
+def _onAlarm(signum, frame):
+    raise RunTimeout()
+
+# Calls function(data) with a wall clock limit, returns (seconds, result)
+def timedRun(function, data, timeout: float) -> tuple:
+    previous = signal.signal(signal.SIGALRM, _onAlarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        start = time.perf_counter()
+        result = function(data)
+        return time.perf_counter() - start, result
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+# Runs every size of a case, stopping at the first size over budget
+def runCase(case, repeats: int, budget: float, timeout: float, maxSize: int = None) -> list:
+    results = []
+    stopped = None
+    for size in case.sizes:
+        entry = {'case': case.name, 'size': size, 'unit': case.unit}
+        if stopped or (maxSize is not None and size > maxSize):
+            entry['status'] = 'skipped'
+            entry['reason'] = stopped or 'size above --max-size'
+            results.append(entry)
+            continue
+
+        logger.info("Running %s size %s", case.name, size)
+        data = case.setup(size)
+        times = []
+        try:
+            for _ in range(repeats):
+                seconds, result = timedRun(case.run, data, timeout)
+                times.append(seconds)
+                if seconds > budget:
+                    break
+            ok = bool(case.check(data, result))
+            entry.update({
+                'status': 'ok' if ok else 'wrong',
+                'seconds': statistics.median(times),
+                'minSeconds': min(times),
+                'repeats': len(times),
+            })
+            if case.unit in ('bytes', 'characters', 'messages') and size:
+                entry['perSecond'] = size / min(times)
+        except RunTimeout:
+            entry.update({'status': 'timeout', 'seconds': timeout})
+        except Exception as e:
+            logger.warning("%s size %s failed: %r", case.name, size, e)
+            entry.update({'status': 'error', 'error': repr(e)})
+        if entry['status'] in ('wrong', 'timeout') and size in case.known:
+            entry.update({'status': 'known-wrong', 'outcome': entry['status'], 'reason': case.known[size]})
+
+        if entry.get('outcome', entry['status']) == 'timeout' or entry.get('seconds', 0) > budget:
+            stopped = 'previous size over budget'
+        results.append(entry)
+    return results
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+# Entries slower than the previous report by more than tolerance (fraction)
+def regressions(results: list, previous: dict, tolerance: float) -> list:
+    before = {(entry['case'], entry['size']): entry for entry in previous['results']}
+    found = []
+    for entry in results:
+        old = before.get((entry['case'], entry['size']))
+        if not old or 'minSeconds' not in old or 'minSeconds' not in entry:
+            continue
+        ratio = entry['minSeconds'] / old['minSeconds'] if old['minSeconds'] > 0 else 1.0
+        if ratio > 1 + tolerance:
+            found.append({'case': entry['case'], 'size': entry['size'], 'ratio': ratio,
+                          'before': old['minSeconds'], 'after': entry['minSeconds']})
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks with correctness oracles for every algorithm in the repository")
+    parser.add_argument('--cases', nargs='*', help="run only cases whose name starts with one of these prefixes")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=10.0, help="seconds per run before larger sizes are skipped")
+    parser.add_argument('--timeout', type=float, default=120.0, help="seconds after which a run is interrupted")
+    parser.add_argument('--max-size', type=int, help="skip sizes above this value")
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', metavar='FILE', help="previous report to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--list', action='store_true', help="list cases and sizes")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+    # Timings are of the computations, not of the result cache
+    os.environ['CRYPTO_CACHE'] = 'off'
+
+    cases = [case for case in allCases() if not args.cases or any(case.name.startswith(p) for p in args.cases)]
+    if args.list:
+        for case in cases:
+            print(case.name, case.sizes)
+        return
+
+    output = os.path.abspath(args.output)
+    # lab2 writes its tables to SBOX directories in the working directory
+    workingDirectory = os.getcwd()
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            for case in cases:
+                results += runCase(case, args.repeats, args.budget, args.timeout, args.max_size)
+        finally:
+            os.chdir(workingDirectory)
+
+    report = {'environment': environment(), 'results': results}
+    failed = [entry for entry in results if entry['status'] in FAILED]
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = regressions(results, json.load(f), args.tolerance)
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for entry in results:
+        logger.info("%-24s %10s  %-11s %s%s", entry['case'], entry['size'], entry['status'],
+                    '{:.6f} s'.format(entry['minSeconds']) if 'minSeconds' in entry else '',
+                    '  {:.0f} {}/s'.format(entry['perSecond'], entry['unit']) if 'perSecond' in entry else '')
+    for regression in report.get('regressions', []):
+        logger.warning("Regression %s size %s: %.2fx slower", regression['case'], regression['size'], regression['ratio'])
+    for entry in failed:
+        logger.error("%s size %s: %s", entry['case'], entry['size'], entry['status'])
+    logger.info("Report written to %s", output)
+
+    if failed or report.get('regressions'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import numpy as np
+
+"""
+Boolean function helpers shared by the labs.
+parity(x) is the XOR of the bits of x, a.x below is parity(a & x).
+The Walsh-Hadamard transform of (-1)^f gives W(a) = sum over x of (-1)^(f(x) ^ a.x).
+"""
+
+# Parity of every value smaller than 2^bits
+def parityTable(bits: int) -> np.ndarray:
+    parity = np.zeros(1 << bits, dtype=np.uint8)
+    for i in range(bits):
+        parity[1 << i: 2 << i] = parity[:1 << i] ^ 1
+    return parity
+
+# Parity of every element of a uint64 array, for values too wide for a table
+def parity(values) -> np.ndarray:
+    values = np.asarray(values, dtype=np.uint64).copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        values ^= values >> np.uint64(shift)
+    return (values & np.uint64(1)).astype(np.intp)
+
+# Fast Walsh-Hadamard transform over the last axis, leading axes are treated as a batch
+def fwht(values: np.ndarray) -> np.ndarray:
+    result = np.array(values, dtype=np.int32)
+    size = result.shape[-1]
+    if size & (size - 1):
+        raise ValueError("Length of the transformed axis must be a power of two, got {}".format(size))
+
+    batch = result.shape[:-1]
+    h = 1
+    while h < size:
+        butterfly = result.reshape(batch + (size // (2*h), 2, h))
+        low = butterfly[..., 0, :].copy()
+        butterfly[..., 0, :] += butterfly[..., 1, :]
+        butterfly[..., 1, :] *= -1
+        butterfly[..., 1, :] += low
+        h *= 2
+    return result
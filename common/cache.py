@@ -0,0 +1,124 @@
+import hashlib, json, os, pickle, sqlite3, time, zlib
+
+import numpy as np
+
+from common.instrumentation import count
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+Content-addressed cache of analysis results shared by the labs.
+
+Key: sha256 over the analysis name, its parameters (JSON) and the bytes, dtype and shape of
+the input arrays (S-box table, truth tables, pair lists), so an unchanged S-box hits no matter
+which file or position it came from. Values are pickled and zlib-compressed into one sqlite
+table; every hit refreshes its use time and the least recently used entries are evicted when
+the stored size exceeds the limit.
+
+CRYPTO_CACHE=<file> moves the store (default .cache/analysis.sqlite in the repository),
+CRYPTO_CACHE=off or --no-cache disables it, CRYPTO_CACHE_SIZE sets the limit in MiB (default 256).
+Bump VERSION when a cached analysis changes its result.
+"""
+
+VERSION = 1
+# Returned by Cache.get on a miss, so a cached None is told apart from a missing entry
+MISSING = object()
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'analysis.sqlite')
+
+
+class Cache:
+    def __init__(self, path: str = None, maxBytes: int = None):
+        self.path = path
+        self.maxBytes = maxBytes
+        self._connection = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return os.environ.get('CRYPTO_CACHE', '') != 'off'
+
+    # Settings not given to the constructor are read from the environment on first use
+    def settings(self):
+        if self.path is None:
+            self.path = os.environ.get('CRYPTO_CACHE') or DEFAULT_PATH
+        if self.maxBytes is None:
+            self.maxBytes = int(float(os.environ.get('CRYPTO_CACHE_SIZE', 256)) * (1 << 20))
+
+    # One connection per process, workers of a pool open their own
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            self.settings()
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS entries '
+                                     '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS entriesUsed ON entries (used)')
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def key(name: str, arrays: list, params: dict = None) -> str:
+        digest = hashlib.sha256(json.dumps([VERSION, name, params or {}], sort_keys=True).encode())
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            digest.update(str((array.dtype.str, array.shape)).encode())
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        connection = self.connection()
+        row = connection.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return MISSING
+        connection.execute('UPDATE entries SET used = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, value):
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        connection = self.connection()
+        if len(blob) > self.maxBytes:
+            return
+        connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', (key, blob, len(blob), time.time()))
+        self.evict()
+
+    # Drops least recently used entries until the store fits in maxBytes
+    def evict(self):
+        connection = self.connection()
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.maxBytes:
+            return
+        removed = 0
+        for key, size in connection.execute('SELECT key, size FROM entries ORDER BY used').fetchall():
+            if total <= self.maxBytes:
+                break
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            removed += 1
+        count('cache.evicted', removed)
+        logger.debug("Cache evicted %d entries, %d bytes left", removed, total)
+
+    def clear(self):
+        self.connection().execute('DELETE FROM entries')
+
+    # Returns the cached result of compute() for the analysis name on the given inputs
+    def memoize(self, name: str, arrays: list, params: dict, compute):
+        if not self.enabled:
+            return compute()
+        key = self.key(name, arrays, params)
+        value = self.get(key)
+        if value is not MISSING:
+            count('cache.hit')
+            logger.debug("Cache hit for %s", name)
+            return value
+        count('cache.miss')
+        value = compute()
+        self.put(key, value)
+        return value
+
+
+cache = Cache()
+memoize = cache.memoize
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+
+"""
+Atomic result writes: data goes to a temporary file next to the target (unique per process)
+and is renamed over it with os.replace, so an interrupted run leaves either the old file or
+the complete new one, never a half-written file.
+"""
+
+def _temporary(path: str) -> str:
+    return '{}.{}.tmp'.format(path, os.getpid())
+
+# Writes text (str) or bytes to path atomically
+def writeAtomic(path: str, data):
+    temporary = _temporary(path)
+    try:
+        with open(temporary, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+# np.save to path atomically, path should end with .npy
+def saveAtomic(path: str, array: np.ndarray):
+    temporary = _temporary(path)
+    try:
+        with open(temporary, 'wb') as f:
+            np.save(f, array)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+# np.savez of the named arrays to path atomically, path should end with .npz
+def savezAtomic(path: str, **arrays):
+    temporary = _temporary(path)
+    try:
+        with open(temporary, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
@@ -0,0 +1,133 @@
+import argparse, atexit, json, os, time
+
+import logging
+
+"""
+Shared logging and profiling setup for the labs and lecture scripts.
+
+Modules only create loggers with logging.getLogger(__name__) and pass message arguments
+lazily (logger.debug("x: %s", x)), nothing is configured or formatted at import.
+Profiling is off by default: span() returns a shared no-op context manager and count()
+returns immediately. With --profile (or CRYPTO_PROFILE=<file>) spans collect wall time
+and call counts per phase, counters are summed, and everything is written as JSON at exit.
+"""
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    def __init__(self, stats: list):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.start
+        stats = self.stats
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed < stats[2]:
+            stats[2] = elapsed
+        if elapsed > stats[3]:
+            stats[3] = elapsed
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+# Collects timing spans and counters while enabled
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.spans = {}
+        self.counters = {}
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NO_SPAN
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = [0, 0, float('inf'), 0]
+        return _Span(stats)
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        self.spans.clear()
+        self.counters.clear()
+
+    def export(self) -> dict:
+        spans = {}
+        for name, (calls, total, shortest, longest) in sorted(self.spans.items()):
+            spans[name] = {
+                'calls': calls,
+                'totalSeconds': total / 1e9,
+                'meanSeconds': total / calls / 1e9 if calls else 0.0,
+                'minSeconds': shortest / 1e9 if calls else 0.0,
+                'maxSeconds': longest / 1e9,
+            }
+        return {'spans': spans, 'counters': dict(sorted(self.counters.items()))}
+
+    def exportJson(self, fileName: str):
+        with open(fileName, 'w') as f:
+            json.dump(self.export(), f, indent=2)
+
+
+profiler = Profiler()
+
+
+# Timing span for a phase, e.g. with span('keccak.theta'): ...
+def span(name: str):
+    return profiler.span(name)
+
+# Adds amount to a named counter
+def count(name: str, amount: int = 1):
+    profiler.count(name, amount)
+
+# Starts collecting, the report is written to fileName at exit when given
+def enableProfiling(fileName: str = None):
+    profiler.enabled = True
+    if fileName:
+        atexit.register(profiler.exportJson, fileName)
+
+# Command line options shared by every script
+def addArguments(parser: argparse.ArgumentParser):
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every step (DEBUG level)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="log only warnings and errors")
+    parser.add_argument('--profile', metavar='FILE', nargs='?', const='profile.json',
+                        help="collect per-phase timings and counters and write them as JSON (default profile.json)")
+    parser.add_argument('--no-cache', action='store_true', help="recompute analyses instead of using the result cache")
+
+# Configures logging, profiling and the result cache from parsed arguments and the CRYPTO_PROFILE variable
+def configure(args: argparse.Namespace):
+    level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+    profile = args.profile or os.environ.get('CRYPTO_PROFILE')
+    if profile:
+        enableProfiling(profile)
+
+    # Read by common.cache, the variable also reaches worker processes
+    if args.no_cache:
+        os.environ['CRYPTO_CACHE'] = 'off'
+
+# Parses the shared options of a script that has no options of its own
+def setup(description: str = None, argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    addArguments(parser)
+    args = parser.parse_args(argv)
+    configure(args)
+    return args
@@ -0,0 +1,68 @@
+import numpy as np
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from sbox import Sbox
+
+"""
+Algebraic normal form of f: {0,1}^n -> {0,1}
+f(x) = XOR over u of c(u) * x^u, where x^u is the product of x_i for bits i set in u
+c is the Moebius transform of the truth table and deg f = max weight of u with c(u) = 1
+"""
+
+# Hamming weight of every value smaller than 2^bits
+def weightTable(bits: int) -> np.ndarray:
+    weight = np.zeros(1 << bits, dtype=np.uint8)
+    for i in range(bits):
+        weight[1 << i: 2 << i] = weight[:1 << i] + 1
+    return weight
+
+# In-place Moebius transform of truth tables packed 8 inputs per byte (bit x % 8 of byte x // 8)
+def moebiusTransform(packed: np.ndarray, size: int) -> np.ndarray:
+    for h, mask in ((1, 0x55), (2, 0x33), (4, 0x0F)):
+        if h < size:
+            packed ^= (packed & np.uint8(mask)) << np.uint8(h)
+
+    batch = packed.shape[:-1]
+    step = 1
+    while 8 * step < size:
+        butterfly = packed.reshape(batch + (-1, 2, step))
+        butterfly[..., 1, :] ^= butterfly[..., 0, :]
+        step *= 2
+    return packed
+
+# ANF coefficients of 0/1 truth tables (one function per row for 2D input)
+def algebraicNormalForm(functions: np.ndarray) -> np.ndarray:
+    functions = np.asarray(functions, dtype=np.uint8)
+    size = functions.shape[-1]
+    packed = np.packbits(functions, axis=-1, bitorder='little')
+    moebiusTransform(packed, size)
+    return np.unpackbits(packed, axis=-1, bitorder='little')[..., :size]
+
+# Algebraic degree from ANF coefficients, constant functions have degree 0
+def algebraicDegree(anf: np.ndarray) -> np.ndarray:
+    size = anf.shape[-1]
+    weights = weightTable(size.bit_length() - 1)
+    return np.where(anf == 1, weights, 0).max(axis=-1)
+
+# Readable ANF, e.g. 1 ^ x0 ^ x1x3
+def anfToString(anf: np.ndarray) -> str:
+    monomials = []
+    for u in np.flatnonzero(anf):
+        variables = ''.join('x{}'.format(i) for i in range(int(u).bit_length()) if (u >> i) & 1)
+        monomials.append(variables or '1')
+    return ' ^ '.join(monomials) or '0'
+
+# Degrees of every coordinate and nonzero component function
+def analyzeAlgebraic(sbox: Sbox, functions: np.ndarray) -> dict:
+    logger.debug("Computing algebraic degree of %s", sbox)
+    coordinateDegrees = algebraicDegree(algebraicNormalForm(functions))
+    componentDegrees = algebraicDegree(algebraicNormalForm(sbox.componentFunctions()[1:]))
+    return {
+        'degree': int(coordinateDegrees.max()),
+        'coordinateDegrees': coordinateDegrees.tolist(),
+        'componentDegrees': componentDegrees,
+        'minimumComponentDegree': int(componentDegrees.min()),
+    }
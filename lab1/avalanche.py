@@ -0,0 +1,43 @@
+import numpy as np
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+Avalanche criteria of functions given as 0/1 rows (output j is row j, input x is column x).
+Flipping input bit i maps column x to column x ^ (1 << i), for every bit at once:
+D[i, j, x] = f_j(x) ^ f_j(x ^ (1 << i))
+"""
+
+# Output differences for every single-bit input flip, shape (inputs, outputs, size)
+def flipDifferences(functions: np.ndarray) -> np.ndarray:
+    functions = np.atleast_2d(np.asarray(functions, dtype=np.uint8))
+    size = functions.shape[-1]
+    n = size.bit_length() - 1
+    x = np.arange(size)
+    flipped = x[None, :] ^ (1 << np.arange(n))[:, None]
+    return functions[None, :, :] ^ functions[:, flipped].transpose(1, 0, 2)
+
+# SAC matrix, entry [i, j] is the probability that output j changes when input bit i is flipped
+def sacMatrix(functions: np.ndarray) -> np.ndarray:
+    logger.debug("Computing SAC matrix")
+    return flipDifferences(functions).mean(axis=-1)
+
+# BIC matrix, entry [j, k] is the highest correlation of output changes j and k over all input flips
+def bicMatrix(functions: np.ndarray) -> np.ndarray:
+    logger.debug("Computing BIC matrix")
+    differences = flipDifferences(functions).astype(np.float32)
+    size = differences.shape[-1]
+
+    mean = differences.mean(axis=-1, dtype=np.float64)
+    joint = (differences @ differences.transpose(0, 2, 1)).astype(np.float64) / size
+    covariance = joint - mean[:, :, None] * mean[:, None, :]
+    deviation = np.sqrt(mean * (1 - mean))
+    scale = deviation[:, :, None] * deviation[:, None, :]
+
+    correlation = np.zeros_like(covariance)
+    np.divide(covariance, scale, out=correlation, where=scale > 0)
+    bic = np.abs(correlation).max(axis=0)
+    np.fill_diagonal(bic, 0)
+    return bic
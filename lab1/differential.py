@@ -0,0 +1,113 @@
+import numpy as np
+import os, sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import span
+
+import logging
+
+from sbox import Sbox
+from walsh import componentSpectrum
+
+logger = logging.getLogger(__name__)
+
+"""
+Difference distribution table:  DDT[a, b] = #{x : S(x) ^ S(x ^ a) = b}
+Linear approximation table:     LAT[a, b] = #{x : a.x = b.S(x)} - 2^(n-1)
+Boomerang connectivity table:   BCT[a, b] = #{x : S^-1(S(x) ^ b) ^ S^-1(S(x ^ a) ^ b) = a}
+
+Memory for an n x m S-box (tables are int32):
+DDT 4 * 2^(n+m) bytes plus 24 bytes per pair and 8 per count of a block of rows (at most 2^22 pairs)
+LAT 13 * 2^(n+m) bytes at peak (component truth tables and the transform)
+BCT 4 * 2^(n+m) bytes plus 24 * 2^(n+m) bytes per row, 2^(2n+m) lookups in total
+12 x 12: DDT 192 MiB, LAT 208 MiB, BCT is not practical (2^36 lookups)
+"""
+
+# Input differences per DDT block, the block holds at most 2^22 pairs (x, x ^ a)
+def _ddtBlock(size: int) -> int:
+    return min(size, max(1, (1 << 22) // size))
+
+# Bytes needed to build each table for an n x m S-box
+def tableMemory(n: int, m: int) -> dict:
+    cells = 1 << (n + m)
+    rows = _ddtBlock(1 << n)
+    return {
+        # int32 table, then per block the int64 indices, gathered outputs and cells of every pair and the counts
+        'ddt': 4 * cells + 24 * rows * (1 << n) + 8 * rows * (1 << m),
+        'lat': 13 * cells,
+        'bct': 4 * cells + 24 * cells,
+    }
+
+# DDT built from XOR outer products of the lookup table, counted with bincount
+def differenceDistributionTable(sbox: Sbox) -> np.ndarray:
+    logger.debug("Generating DDT of %s", sbox)
+    size, outputs = sbox.size, 1 << sbox.outputBits
+    table = sbox.table.astype(np.int64)
+    x = np.arange(size)
+
+    ddt = np.empty((size, outputs), dtype=np.int32)
+    block = _ddtBlock(size)
+    with span('differential.ddt'):
+        for start in range(0, size, block):
+            a = np.arange(start, min(start + block, size))
+            b = table[x[None, :] ^ a[:, None]] ^ table[None, :]
+            cells = b + (np.arange(len(a)) * outputs)[:, None]
+            ddt[a] = np.bincount(cells.ravel(), minlength=len(a) * outputs).reshape(len(a), outputs)
+    return ddt
+
+# LAT from the Walsh spectra of all component functions
+def linearApproximationTable(sbox: Sbox) -> np.ndarray:
+    logger.debug("Generating LAT of %s", sbox)
+    with span('differential.lat'):
+        return componentSpectrum(sbox).T // 2
+
+# BCT of a bijective S-box
+def boomerangConnectivityTable(sbox: Sbox) -> np.ndarray:
+    logger.debug("Generating BCT of %s", sbox)
+    if not sbox.isBijective():
+        raise ValueError("BCT is defined only for bijective S-boxes, got {}".format(sbox))
+
+    size = sbox.size
+    table = sbox.table.astype(np.int64)
+    inverse = np.argsort(table)
+    x = np.arange(size)
+    b = x[:, None]
+
+    bct = np.empty((size, size), dtype=np.int32)
+    with span('differential.bct'):
+        y1 = inverse[table[None, :] ^ b]
+        for a in range(size):
+            y2 = inverse[table[None, x ^ a] ^ b]
+            bct[a] = np.count_nonzero((y1 ^ y2) == a, axis=1)
+    return bct
+
+# Highest DDT entry for a nonzero input difference
+def differentialUniformity(ddt: np.ndarray) -> int:
+    return int(ddt[1:].max())
+
+# Highest absolute Walsh coefficient of a nonzero component
+def linearity(lat: np.ndarray) -> int:
+    return int(2 * np.abs(lat[:, 1:]).max())
+
+# Highest BCT entry for nonzero input and output differences
+def boomerangUniformity(bct: np.ndarray) -> int:
+    return int(bct[1:, 1:].max())
+
+# Differential and linear summary, boomerang uniformity only for bijective S-boxes up to maxBoomerangBits
+def analyzeDifferential(sbox: Sbox, maxBoomerangBits: int = 10) -> dict:
+    memory = tableMemory(sbox.inputBits, sbox.outputBits)
+    logger.info("Memory needed for %s (bytes): %s", sbox, memory)
+
+    ddt = differenceDistributionTable(sbox)
+    lat = linearApproximationTable(sbox)
+    result = {
+        'ddt': ddt,
+        'lat': lat,
+        'differentialUniformity': differentialUniformity(ddt),
+        'linearity': linearity(lat),
+        'boomerangUniformity': None,
+    }
+
+    if sbox.isBijective() and sbox.inputBits <= maxBoomerangBits:
+        result['boomerangUniformity'] = boomerangUniformity(boomerangConnectivityTable(sbox))
+    return result
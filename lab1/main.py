@@ -1,180 +1,113 @@
-from asyncio.log import logger
-from operator import index
-from bitarray import bitarray
-from bitarray.util import int2ba
-import itertools, os
+import numpy as np
+import os, sys
 
-import logging
-
-#logging configuration 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import setup, span
+from common.cache import memoize
 
-#Reads the file and returns a bitarray
-def readFile(fileName: str) -> bitarray:
-    logging.info("Reading file: {}".format(fileName))
-    bits = bitarray()
-    with open(fileName, 'rb') as f:
-        bits.fromfile(f)
+from sbox import Sbox
+from differential import analyzeDifferential
+from anf import algebraicNormalForm, anfToString, analyzeAlgebraic
+from avalanche import sacMatrix, bicMatrix
+from walsh import walshSpectrum, nonLinearity, bestAffineApproximations, analyzeComponents
 
-    size = int(len(bits) / 16)
-    logging.info("Bits: {}, Size: {}".format(bits, size))
-    return bits, size
+import logging
 
+logger = logging.getLogger(__name__)
 
-#Removes unwanted zeros from the bitarray
-def removeZeros(bits: bitarray, size: int) -> bitarray:
-    logging.info("Removing zeros")
-    for i in range(size):
-        for j in range(8):
-            bits.pop(8*(i+1))
-    logging.info("Bits: {}".format(bits))
-    return bits
+#Genarate functions based on sbox bit-planes
+def genarateFunctions(sbox: Sbox) -> np.ndarray:
+    logger.debug("Generating functions")
+    return sbox.bitPlanes()
 
 
-#Genarate functions based on bitarray
-def genarateFunctions(bits: bitarray, size: int) -> list:
-    logging.info("Generating functions")
-    functions = []
-    for i in range(8):
-        function = bitarray()
-        for j in range(size):
-            function.append(bits[i+8*j])
-        functions.append(function)
-    return functions
+#Hexadecimal form of a 0/1 function
+def functionToHex(function: np.ndarray) -> str:
+    return np.packbits(function).tobytes().hex()
 
 
 #Check function balance based on number of ones and zeros
-def checkFunctionBalance(function: bitarray) -> bool:
-    logging.info("Checking function balance")
-    z = function.count(0)
-    o = function.count(1)
-    logging.info("Zeros: {}, Ones: {}".format(z, o))
+def checkFunctionBalance(function: np.ndarray) -> bool:
+    logger.debug("Checking function balance")
+    o = int(np.count_nonzero(function))
+    z = len(function) - o
+    logger.debug("Zeros: %d, Ones: %d", z, o)
     return z == o
 
 
 def checkAllFunctionBalance(functions: list):
-    logging.info("Checking all functions balance")
+    logger.debug("Checking all functions balance")
     for function in functions:
         if checkFunctionBalance(function) is False:
-            logging.info("Function is not balanced [{}]".format(function))
-
-
-#Create array with all possible combinations of size
-def createCombinations(size: int) -> list:
-    logging.info("Creating combinations")
-    combinations = []
-    index = list(range(0, size))
-    for i in range(1, size+1):
-        combinations += list(itertools.combinations(index, i))
-    return combinations
-
-
-#Genarate linear functions
-def genarateLinearFunctions(size: int) -> list:
-    logging.info("Generating linear functions")
-    functions = []
-    for i in range(size):
-        function = bitarray('0'*8)
-        num = int2ba(i)
-        for _ in range(len(str(num.to01()))):
-            function.pop()
-        function.extend(num)
-        functions.append(function)
-
-    combinations = createCombinations(8)
-
-    logger.info("Generating combinations for functions")
-    result = []
-    for combination in combinations:
-        tmp = bitarray()
-        for bits in functions:
-            xs = []
-            for i in combination:
-                xs.append(int(bits[7 - i]))
-            partResult = xs[0]
-            for i in range(1, len(xs), 1):
-                partResult ^= xs[i]
-            tmp.append(partResult)
-        result.append(tmp)
-
-    result.append(bitarray('0'*size))
-    return result
-
-
-#Check functions non-linearity using linear functions
-def checkFunctionNonLinearity(functions: bitarray, size: int) -> bool:
-    logger.info("Checking function non-linearity of size {}".format(size))
-    linearFunctions = genarateLinearFunctions(size)
-    result = []
-    for function in functions:
-        tmpResult = []
-        for linearFunction in linearFunctions:
-            xor = []
-            for i in range(size):
-                xor.append(function[i] ^ linearFunction[i])
-            tmpResult.append(sum(xor))
-        result.append(min(tmpResult))
-    return result
-
-
-#SAC check
-def sacCheck(functions: list, size: int) -> list:
-    logger.info("SAC check")
-    result = []
-    for function in functions:
-        partResult = []
-        for i in range(8):
-            newFunction = []
-            power = 2**i
-            pairNumber = int(size / (power*2))
-            lastIndex = 0
-            for _ in range(pairNumber):
-                up = []
-                down = []
-                for k in range(lastIndex, lastIndex + power):
-                    up.append(int(function[k]))
-                    lastIndex += 1
-                for k in range(lastIndex, lastIndex + power):
-                    down.append(int(function[k]))
-                    lastIndex += 1
-                newFunction += down + up
-            partResult.append(newFunction)
-        result.append(partResult)
-    
-    sacs = []
-    for function, partResult in zip(functions, result):
-        sac = []
-        logger.info("Function: {}".format(function.tobytes().hex()))
-        for element in partResult:
-            xor = []
-            for i in range(size):
-                tmpXor = function[i] ^ element[i]
-                xor.append(tmpXor)
-            sac.append(sum(xor))
-        value = (((sum(sac) / len(sac)) / size))
-        logger.info("Value: {}".format(value))
-        sacs.append(value)
-    
+            logger.info("Function is not balanced [%s]", functionToHex(function))
+
+
+#Check functions non-linearity using Walsh spectrum, results are cached by the truth tables
+def checkFunctionNonLinearity(functions: np.ndarray, size: int) -> list:
+    logger.debug("Checking function non-linearity of size %d", size)
+    if logger.isEnabledFor(logging.DEBUG):
+        spectrum = walshSpectrum(functions)
+        for function, approximations in zip(functions, bestAffineApproximations(spectrum)):
+            logger.debug("Best affine approximations (mask, constant) of %s: %s", functionToHex(function), approximations)
+    return memoize('lab1.nonLinearity', [functions], {}, lambda: nonLinearity(walshSpectrum(functions)).tolist())
+
+
+#SAC check, results are cached by the truth tables
+def sacCheck(functions: np.ndarray, size: int) -> list:
+    logger.debug("SAC check")
+    sacs = memoize('lab1.sac', [functions], {}, lambda: sacMatrix(functions).mean(axis=0).tolist())
+    if logger.isEnabledFor(logging.DEBUG):
+        for function, value in zip(functions, sacs):
+            logger.debug("Function: %s, Value: %s", functionToHex(function), value)
     return sacs
 
 
-def main():          
+def main():
+    setup("Analysis of the functions of sbox.SBX")
     logger.info("Starting program")
-    file, size = readFile('sbox.SBX')
-    file = removeZeros(file, size)
+    with span('lab1.read'):
+        sbox = Sbox.fromFile('sbox.SBX')
+    size = sbox.size
+    logger.info("%s, Size: %d", sbox, size)
 
-    functions = genarateFunctions(file, size)
+    functions = genarateFunctions(sbox)
     for function in functions:
-        logger.info("Function: {}".format(function.tobytes().hex()))
-
-    checkAllFunctionBalance(functions)
-
-    result = checkFunctionNonLinearity(functions, size)
-    logger.info("Result Non Linear: {}".format(result))
-
-    sacs = sacCheck(functions, size)
-    logger.info("SAC for functions: {}".format(sacs))
-    logger.info("Average SAC: {}".format(sum(sacs) / len(sacs)))
+        logger.info("Function: %s", functionToHex(function))
+
+    with span('lab1.balance'):
+        checkAllFunctionBalance(functions)
+
+    with span('lab1.nonLinearity'):
+        result = checkFunctionNonLinearity(functions, size)
+    logger.info("Result Non Linear: %s", result)
+
+    with span('lab1.components'):
+        components = analyzeComponents(sbox)
+    logger.info("S-box non linearity: %d, worst component: %d", components['nonLinearity'], components['worstComponent'])
+    logger.info("Unbalanced components: %s", components['unbalancedComponents'])
+
+    with span('lab1.differential'):
+        differential = analyzeDifferential(sbox)
+    logger.info("Differential uniformity: %d, linearity: %d, boomerang uniformity: %s",
+        differential['differentialUniformity'], differential['linearity'], differential['boomerangUniformity'])
+
+    with span('lab1.algebraic'):
+        if logger.isEnabledFor(logging.DEBUG):
+            for function, anf in zip(functions, algebraicNormalForm(functions)):
+                logger.debug("ANF of %s: %s", functionToHex(function), anfToString(anf))
+        algebraic = analyzeAlgebraic(sbox, functions)
+    logger.info("Algebraic degree: %d, coordinate degrees: %s, minimum component degree: %d",
+        algebraic['degree'], algebraic['coordinateDegrees'], algebraic['minimumComponentDegree'])
+
+    with span('lab1.sac'):
+        sacs = sacCheck(functions, size)
+    logger.info("SAC for functions: %s", sacs)
+    logger.info("Average SAC: %s", sum(sacs) / len(sacs))
+
+    with span('lab1.sacMatrix'):
+        logger.info("SAC matrix (input bit x output function):\n%s", sacMatrix(functions))
+    with span('lab1.bicMatrix'):
+        logger.info("BIC matrix (output function x output function):\n%s", bicMatrix(functions))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
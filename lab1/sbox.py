@@ -0,0 +1,77 @@
+import numpy as np
+import os, sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.boolean import parityTable
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+S-box file (.SBX) layout:
+2^n little endian 16 bit words, word x holds the output S(x)
+"""
+
+# S-box backed by a lookup table, entry x is the output for input x
+class Sbox:
+    def __init__(self, table: np.ndarray, outputBits: int = None):
+        size = len(table)
+        if size == 0 or size & (size - 1):
+            raise ValueError("S-box size must be a power of two, got {}".format(size))
+
+        self.table = table
+        self.inputBits = size.bit_length() - 1
+        if outputBits is None:
+            outputBits = max(1, int(table.max()).bit_length())
+        self.outputBits = outputBits
+
+    # Maps the file without parsing, tables with outputs wider than 8 bits are used in place
+    @staticmethod
+    def fromFile(fileName: str, outputBits: int = None) -> 'Sbox':
+        logger.debug("Reading S-box file: %s", fileName)
+        words = np.memmap(fileName, dtype='<u2', mode='r')
+        if outputBits is None:
+            outputBits = max(1, int(words.max()).bit_length())
+        table = words.astype(np.uint8) if outputBits <= 8 else words
+        return Sbox(table, outputBits)
+
+    # Writes the table in the .SBX layout
+    def toFile(self, fileName: str):
+        logger.debug("Writing S-box file: %s", fileName)
+        np.asarray(self.table, dtype='<u2').tofile(fileName)
+
+    @property
+    def size(self) -> int:
+        return len(self.table)
+
+    def isBijective(self) -> bool:
+        return self.inputBits == self.outputBits and len(np.unique(self.table)) == self.size
+
+    # Coordinate functions as 0/1 rows, row i is output bit outputBits-1-i (most significant first)
+    def bitPlanes(self) -> np.ndarray:
+        shifts = np.arange(self.outputBits - 1, -1, -1, dtype=self.table.dtype)
+        return ((self.table[None, :] >> shifts[:, None]) & 1).astype(np.uint8)
+
+    # Coordinate functions packed 8 inputs per byte, bit x % 8 of byte x // 8 is f(x)
+    def packedBitPlanes(self) -> np.ndarray:
+        return np.packbits(self.bitPlanes(), axis=-1, bitorder='little')
+
+    # Coordinate functions as integers, bit x is f(x)
+    def coordinateFunctionInts(self) -> list:
+        return [int.from_bytes(row.tobytes(), 'little') for row in self.packedBitPlanes()]
+
+    # Component function mask.S(x) as a 0/1 row
+    def componentFunction(self, mask: int) -> np.ndarray:
+        return parityTable(self.outputBits)[self.table & mask]
+
+    # All component functions as 0/1 rows, row u is u.S(x) (row 0 is the zero function)
+    def componentFunctions(self) -> np.ndarray:
+        masks = np.arange(1 << self.outputBits, dtype=self.table.dtype)
+        return parityTable(self.outputBits)[self.table[None, :] & masks[:, None]]
+
+    def __str__(self):
+        return 'Sbox {}x{}'.format(self.inputBits, self.outputBits)
+
+    def __repr__(self):
+        return str(self)
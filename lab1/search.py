@@ -0,0 +1,226 @@
+import argparse, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure, count
+from common.boolean import parityTable
+from common.files import savezAtomic
+
+import logging
+
+from sbox import Sbox
+from walsh import componentSpectrum, nonLinearity
+from avalanche import sacMatrix
+
+logger = logging.getLogger(__name__)
+
+"""
+Search for bijective S-boxes by swapping two entries of the table.
+
+Swapping S(x1) = y1 and S(x2) = y2 changes the Walsh coefficient W[u, a] only when
+u.(y1 ^ y2) = 1 and a.(x1 ^ x2) = 1, and then by -4 * (-1)^(u.y1) * (-1)^(a.x1),
+so a swap touches a quarter of the spectrum. SAC counters change only for the pairs
+(x, x ^ e_i) that contain x1 or x2.
+
+Cost (lower is better):
+sum over u != 0, a of | |W[u, a]| - threshold |^exponent / 2^(2n)
++ sacWeight * sum over i, j of (SAC[i, j] - 1/2)^2
+with threshold 0 and exponent 4 the Walsh part equals the sum of squared DDT entries minus 2^(2n).
+"""
+
+# Mutable state of one chain with incrementally maintained Walsh spectrum and SAC counters
+class SearchState:
+    def __init__(self, table: np.ndarray, threshold: float = 0, exponent: float = 4, sacWeight: float = 0):
+        self.table = np.array(table, dtype=np.int64)
+        self.sbox = Sbox(self.table)
+        if not self.sbox.isBijective():
+            raise ValueError("Search works on bijective S-boxes, got {}".format(self.sbox))
+
+        self.n = self.sbox.inputBits
+        self.size = self.sbox.size
+        self.threshold = threshold
+        self.exponent = exponent
+        self.sacWeight = sacWeight
+
+        parity = parityTable(self.n)
+        values = np.arange(self.size)
+        self.signs = (1 - 2 * parity[values[:, None] & values[None, :]].astype(np.int32))
+        self.masks = [None] * self.size
+        self.unitVectors = 1 << np.arange(self.n)
+
+        self.spectrum = componentSpectrum(self.sbox)
+        self.walshCost = float(self.__walshTerms(self.spectrum[1:]).sum())
+        self.sacCounts = np.rint(sacMatrix(self.sbox.bitPlanes()) * self.size).astype(np.int64)
+        self.cost = self.__totalCost(self.walshCost, self.sacCounts)
+
+    # Masks v with v.d = 1, cached per difference d
+    def __oddMasks(self, d: int) -> np.ndarray:
+        if self.masks[d] is None:
+            self.masks[d] = np.flatnonzero(self.signs[d] < 0)
+        return self.masks[d]
+
+    def __walshTerms(self, spectrum: np.ndarray) -> np.ndarray:
+        return np.abs(np.abs(spectrum) - self.threshold) ** self.exponent / self.size**2
+
+    def __totalCost(self, walshCost: float, sacCounts: np.ndarray) -> float:
+        deviation = sacCounts / self.size - 0.5
+        return walshCost + self.sacWeight * float((deviation**2).sum())
+
+    # SAC counters after swapping the outputs of x1 and x2
+    def __swappedSacCounts(self, x1: int, x2: int) -> np.ndarray:
+        xs = np.unique(np.concatenate(([x1, x2], x1 ^ self.unitVectors, x2 ^ self.unitVectors)))
+        neighbours = xs[:, None] ^ self.unitVectors[None, :]
+        affected = np.isin(xs, (x1, x2))[:, None] | np.isin(neighbours, (x1, x2))
+
+        old = (self.table[xs][:, None] ^ self.table[neighbours])[affected]
+        swapped = self.table.copy()
+        swapped[x1], swapped[x2] = self.table[x2], self.table[x1]
+        new = (swapped[xs][:, None] ^ swapped[neighbours])[affected]
+
+        inputs = np.broadcast_to(np.arange(self.n), affected.shape)[affected]
+        shifts = np.arange(self.n - 1, -1, -1)
+        delta = ((new[:, None] >> shifts) & 1) - ((old[:, None] >> shifts) & 1)
+        counts = self.sacCounts.copy()
+        np.add.at(counts, inputs, delta)
+        return counts
+
+    # Cost change of swapping the outputs of x1 and x2, with what apply() needs to commit it
+    def propose(self, x1: int, x2: int) -> tuple:
+        y1 = int(self.table[x1])
+        rows = self.__oddMasks(y1 ^ int(self.table[x2]))
+        columns = self.__oddMasks(x1 ^ x2)
+        block = np.ix_(rows, columns)
+
+        old = self.spectrum[block]
+        new = old - 4 * np.outer(self.signs[rows, y1], self.signs[columns, x1])
+        walshCost = self.walshCost + float(self.__walshTerms(new).sum() - self.__walshTerms(old).sum())
+
+        sacCounts = self.__swappedSacCounts(x1, x2) if self.sacWeight else self.sacCounts
+        cost = self.__totalCost(walshCost, sacCounts)
+        return cost - self.cost, (x1, x2, block, new, walshCost, sacCounts, cost)
+
+    def apply(self, change: tuple):
+        x1, x2, block, new, walshCost, sacCounts, cost = change
+        self.table[x1], self.table[x2] = self.table[x2], self.table[x1]
+        self.spectrum[block] = new
+        self.walshCost, self.sacCounts, self.cost = walshCost, sacCounts, cost
+
+    def nonLinearity(self) -> int:
+        return int(nonLinearity(self.spectrum[1:]).min())
+
+
+# Runs one simulated annealing chain (temperature 0 is hill climbing), resuming from its checkpoint
+def runChain(config: dict) -> dict:
+    rng = np.random.default_rng(config['seed'])
+    checkpoint = config.get('checkpoint')
+    iteration, temperature = 0, config['temperature']
+
+    if checkpoint and os.path.exists(checkpoint):
+        logger.info("Resuming chain %d from %s", config['chain'], checkpoint)
+        saved = np.load(checkpoint)
+        table, bestTable = saved['table'], saved['bestTable']
+        iteration, temperature = int(saved['iteration']), float(saved['temperature'])
+        rng.bit_generator.state = json.loads(str(saved['rngState']))
+    else:
+        table = config['table'] if config.get('table') is not None else rng.permutation(config['size'])
+        bestTable = table
+
+    state = SearchState(table, config['threshold'], config['exponent'], config['sacWeight'])
+    best = SearchState(bestTable, config['threshold'], config['exponent'], config['sacWeight'])
+    bestTable, bestCost = best.table.copy(), best.cost
+
+    start, evaluations = time.perf_counter(), 0
+    while iteration < config['iterations']:
+        x1, x2 = rng.integers(state.size, size=2)
+        if x1 == x2:
+            continue
+        delta, change = state.propose(int(x1), int(x2))
+        evaluations += 1
+        if delta <= 0 or (temperature > 0 and rng.random() < np.exp(-delta / temperature)):
+            state.apply(change)
+            if state.cost < bestCost:
+                bestTable, bestCost = state.table.copy(), state.cost
+
+        iteration += 1
+        temperature *= config['cooling']
+        if checkpoint and iteration % config['checkpointEvery'] == 0:
+            savezAtomic(checkpoint, table=state.table, bestTable=bestTable, iteration=iteration,
+                        temperature=temperature, rngState=json.dumps(rng.bit_generator.state))
+
+    elapsed = time.perf_counter() - start
+    count('search.evaluations', evaluations)
+    best = SearchState(bestTable, config['threshold'], config['exponent'], config['sacWeight'])
+    return {
+        'chain': config['chain'],
+        'table': bestTable,
+        'cost': bestCost,
+        'nonLinearity': best.nonLinearity(),
+        'evaluationsPerSecond': evaluations / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+# Runs independent chains on a process pool, chain k uses the k-th child of the seed
+def runChains(chains: int, iterations: int, seed: int = 0, n: int = 8, table: np.ndarray = None,
+              temperature: float = 0, cooling: float = 1, threshold: float = 0, exponent: float = 4,
+              sacWeight: float = 0, checkpointDir: str = None, checkpointEvery: int = 1000,
+              workers: int = None) -> list:
+    logger.info("Running %d chains of %d iterations", chains, iterations)
+    if checkpointDir and not os.path.exists(checkpointDir):
+        os.makedirs(checkpointDir)
+
+    configs = []
+    for chain, childSeed in enumerate(np.random.SeedSequence(seed).spawn(chains)):
+        configs.append({
+            'chain': chain, 'seed': childSeed, 'size': 1 << n, 'table': table,
+            'iterations': iterations, 'temperature': temperature, 'cooling': cooling,
+            'threshold': threshold, 'exponent': exponent, 'sacWeight': sacWeight,
+            'checkpoint': os.path.join(checkpointDir, 'chain{}.npz'.format(chain)) if checkpointDir else None,
+            'checkpointEvery': checkpointEvery,
+        })
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(runChain, configs))
+    return sorted(results, key=lambda result: (result['cost'], result['chain']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search for S-boxes with hill climbing or simulated annealing")
+    parser.add_argument('--bits', type=int, default=8)
+    parser.add_argument('--start', help="start every chain from this .SBX file instead of a random permutation")
+    parser.add_argument('--chains', type=int, default=os.cpu_count())
+    parser.add_argument('--iterations', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--temperature', type=float, default=0, help="0 for hill climbing")
+    parser.add_argument('--cooling', type=float, default=1)
+    parser.add_argument('--threshold', type=float, default=0)
+    parser.add_argument('--exponent', type=float, default=4)
+    parser.add_argument('--sac-weight', type=float, default=0)
+    parser.add_argument('--checkpoints', help="directory with per-chain checkpoints, existing ones are resumed")
+    parser.add_argument('--checkpoint-every', type=int, default=1000)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--output', default='best.SBX')
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    table, n = None, args.bits
+    if args.start:
+        start = Sbox.fromFile(args.start)
+        table, n = np.array(start.table), start.inputBits
+
+    results = runChains(args.chains, args.iterations, args.seed, n, table, args.temperature, args.cooling,
+                        args.threshold, args.exponent, args.sac_weight, args.checkpoints,
+                        args.checkpoint_every, args.workers)
+    for result in results:
+        logger.info("Chain %d: cost %.2f, non linearity %d, %.0f evaluations/s",
+            result['chain'], result['cost'], result['nonLinearity'], result['evaluationsPerSecond'])
+
+    Sbox(results[0]['table']).toFile(args.output)
+    logger.info("Best S-box written to %s", args.output)
+
+if __name__ == '__main__':
+    main()
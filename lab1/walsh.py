@@ -0,0 +1,60 @@
+import numpy as np
+import os, sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import span
+from common.boolean import fwht
+
+import logging
+
+from sbox import Sbox
+
+logger = logging.getLogger(__name__)
+
+"""
+Walsh spectrum of a boolean function f: {0,1}^n -> {0,1}
+W(a) = sum over x of (-1)^(f(x) ^ a.x)
+where a.x is the parity of (a & x) and the truth table is indexed by x.
+Component functions of an S-box are u.S(x) for every output mask u != 0.
+"""
+
+# Walsh spectrum of truth tables given as 0/1 arrays (one function per row for 2D input)
+def walshSpectrum(truthTable: np.ndarray) -> np.ndarray:
+    truthTable = np.asarray(truthTable, dtype=np.int32)
+    logger.debug("Walsh spectrum of %s function(s) of size %d", truthTable.shape[:-1], truthTable.shape[-1])
+    with span('walsh.fwht'):
+        return fwht(1 - 2*truthTable)
+
+# Nonlinearity (distance to the nearest affine function) from Walsh spectrum
+def nonLinearity(spectrum: np.ndarray) -> np.ndarray:
+    size = spectrum.shape[-1]
+    return size // 2 - np.abs(spectrum).max(axis=-1) // 2
+
+# Best affine approximations as (mask, constant) pairs, f(x) ~ a.x ^ c
+def bestAffineApproximations(spectrum: np.ndarray) -> list:
+    spectrum = np.asarray(spectrum)
+    if spectrum.ndim != 1:
+        return [bestAffineApproximations(row) for row in spectrum]
+
+    peak = np.abs(spectrum).max()
+    masks = np.flatnonzero(np.abs(spectrum) == peak)
+    return [(int(a), 0 if spectrum[a] > 0 else 1) for a in masks]
+
+# Walsh spectra of all component functions u.S(x), entry [u, a] (row 0 is the trivial component)
+def componentSpectrum(sbox: Sbox) -> np.ndarray:
+    return walshSpectrum(sbox.componentFunctions())
+
+# Nonlinearity, worst component and balance of every nonzero component function (arrays are indexed by mask - 1)
+def analyzeComponents(sbox: Sbox) -> dict:
+    logger.debug("Analyzing component functions of %s", sbox)
+    spectrum = componentSpectrum(sbox)[1:]
+    componentNonLinearity = nonLinearity(spectrum)
+    worst = int(np.argmin(componentNonLinearity))
+    balanced = spectrum[:, 0] == 0
+    return {
+        'nonLinearity': int(componentNonLinearity[worst]),
+        'worstComponent': worst + 1,
+        'componentNonLinearity': componentNonLinearity,
+        'balanced': balanced,
+        'unbalancedComponents': (np.flatnonzero(~balanced) + 1).tolist(),
+    }
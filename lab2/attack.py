@@ -0,0 +1,154 @@
+import argparse, json, os, sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure
+
+import logging
+
+import des
+from pairs import PairTable
+from sboxes import readSbox, generateDifferenceTables
+from stages import runStages
+
+logger = logging.getLogger(__name__)
+
+"""
+Chosen-plaintext differential key recovery simulator.
+
+mode 'sbox'  - one S-box with key whitening, y = S(x ^ k), 6-bit secret k
+mode 'round' - one DES round function, F(R, K) = P(S(E(R) ^ K)), 48-bit secret K,
+               every S-box j with a nonzero input difference E(dR)_j is attacked on its 6 key bits
+
+Pairs (x, x ^ dx) are encrypted under the local secret key. A pair is right for S-box j when
+its output difference is the characteristic output difference dy. Every right pair with known
+S-box input e votes for all keys k with e ^ k in the TZP cell (dx, dy):
+counts[k] += sum over e of rightPairs[e] * candidates[e, k], candidates[e, k] = [e ^ k in TZP(dx, dy)]
+A single characteristic cannot separate k from k ^ dx (both see the same pairs), so the best
+reachable rank is 2; S-boxes with more symmetric cells plateau higher.
+Pairs are generated with the stage schedule of stages.py, so results do not depend on the number
+of workers.
+"""
+
+# candidates[e, k] = 1 when S(e ^ k) ^ S(e ^ k ^ dx) = dy
+def candidateMatrix(tzp: PairTable, dx: int, dy: int) -> np.ndarray:
+    size = tzp.rows
+    cell = np.zeros(size, dtype=np.int64)
+    cell[np.asarray(tzp[dx, dy], dtype=np.intp)] = 1
+    x = np.arange(size)
+    return cell[x[:, None] ^ x[None, :]]
+
+# Worker: encrypts one chunk of pairs and returns the per-box right pair histograms over the S-box input
+def simulateChunk(task: dict) -> np.ndarray:
+    rng = np.random.default_rng(task['seed'])
+    count, tables, boxes = task['count'], task['tables'], task['boxes']
+    dx, dy = task['inputDifferences'], task['outputDifferences']
+    histograms = np.zeros((len(boxes), 64), dtype=np.int64)
+
+    if task['mode'] == 'sbox':
+        table, key = tables[boxes[0]], task['key']
+        x = rng.integers(0, 64, count)
+        difference = table[x ^ key] ^ table[x ^ dx[0] ^ key]
+        histograms[0] = np.bincount(x[difference == dy[0]], minlength=64)
+        return histograms
+
+    right = rng.integers(0, 1 << 32, count, dtype=np.uint64)
+    output = des.feistel(right, task['key'], tables) ^ des.feistel(right ^ np.uint64(task['difference']), task['key'], tables)
+    outputs = des.split(des.permuteInverse(output), 8, 4)
+    inputs = des.split(des.expand(right), 8, 6)
+    for index, box in enumerate(boxes):
+        isRight = outputs[:, box] == dy[index]
+        histograms[index] = np.bincount(inputs[isRight, box], minlength=64)
+    return histograms
+
+# Rank of the true key, number of keys counted at least as often (1 means recovered alone)
+def keyRank(counts: np.ndarray, key: int) -> int:
+    return int(np.count_nonzero(counts >= counts[key]))
+
+# Runs the attack in stages of doubling pair counts up to pairs, returns the rank history
+def simulate(mode: str = 'sbox', pairs: int = 1 << 20, box: int = 1, difference: int = None,
+             outputDifference: int = None, seed: int = 0, workers: int = None, chunk: int = 1 << 16,
+             fileName: str = 'sboxes.txt') -> dict:
+    sboxes = readSbox(fileName)
+    tables = np.stack([sbox.table for sbox in sboxes]).astype(np.int64)
+    tdrs = generateDifferenceTables(sboxes)
+    tzps = [PairTable.fromTable(sbox.table, tdr) for sbox, tdr in zip(sboxes, tdrs)]
+
+    rng = np.random.default_rng(seed)
+    if mode == 'sbox':
+        boxes = [box - 1]
+        key = int(rng.integers(0, 64))
+        tdr = tdrs[boxes[0]]
+        if difference is None:
+            difference = int(np.argmax(tdr[1:].max(axis=1))) + 1
+        inputDifferences = [difference]
+        keys = [key]
+    elif mode == 'round':
+        key = int(rng.integers(0, 1 << 48, dtype=np.uint64))
+        if difference is None:
+            difference = 0xFFFFFFFF
+        boxInputs = des.split(des.expand(difference), 8, 6).tolist()
+        boxes = [j for j in range(8) if boxInputs[j]]
+        inputDifferences = [boxInputs[j] for j in boxes]
+        keys = des.split(key, 8, 6)[boxes].tolist()
+    else:
+        raise ValueError("Unknown mode: {}".format(mode))
+
+    outputDifferences = [int(np.argmax(tdrs[j][dx])) if outputDifference is None else outputDifference
+                         for j, dx in zip(boxes, inputDifferences)]
+    matrices = [candidateMatrix(tzps[j], dx, dy) for j, dx, dy in zip(boxes, inputDifferences, outputDifferences)]
+    for j, dx, dy in zip(boxes, inputDifferences, outputDifferences):
+        logger.info("S%d characteristic %d -> %d, probability %d/64", j + 1, dx, dy, tdrs[j][dx][dy])
+
+    task = {'mode': mode, 'tables': tables, 'boxes': boxes, 'key': key, 'difference': difference,
+            'inputDifferences': inputDifferences, 'outputDifferences': outputDifferences}
+    history = []
+    for stage, histograms in runStages(simulateChunk, task, np.zeros((len(boxes), 64), dtype=np.int64), pairs,
+                                       seed, workers, chunk, 'attack.stage'):
+        counts = [hist @ matrix for hist, matrix in zip(histograms, matrices)]
+        entry = {
+            'pairs': stage,
+            'rightPairs': histograms.sum(axis=1).tolist(),
+            'ranks': [keyRank(c, k) for c, k in zip(counts, keys)],
+            'bestKeys': [int(np.argmax(c)) for c in counts],
+        }
+        logger.info("Pairs %d: right pairs %s, true key ranks %s", stage, entry['rightPairs'], entry['ranks'])
+        history.append(entry)
+
+    return {
+        'mode': mode,
+        'boxes': [j + 1 for j in boxes],
+        'difference': difference,
+        'inputDifferences': inputDifferences,
+        'outputDifferences': outputDifferences,
+        'keys': keys,
+        'history': history,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chosen-plaintext differential key recovery simulator")
+    parser.add_argument('--mode', choices=['sbox', 'round'], default='sbox')
+    parser.add_argument('--pairs', type=int, default=1 << 20)
+    parser.add_argument('--box', type=int, default=1, help="S-box number for --mode sbox")
+    parser.add_argument('--difference', type=lambda v: int(v, 0),
+                        help="input difference (6-bit for sbox, 32-bit dR for round)")
+    parser.add_argument('--output-difference', type=lambda v: int(v, 0),
+                        help="S-box output difference, default the best one for the input difference")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunk', type=int, default=1 << 16)
+    parser.add_argument('--report', help="write the rank history as JSON")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    result = simulate(args.mode, args.pairs, args.box, args.difference, args.output_difference,
+                      args.seed, args.workers, args.chunk)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == '__main__':
+    main()
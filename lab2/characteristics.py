@@ -0,0 +1,349 @@
+import argparse, hashlib, heapq, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure, span, count
+
+import logging
+
+import des
+from sboxes import readSbox, generateDifferenceTables
+
+logger = logging.getLogger(__name__)
+
+"""
+Best multi-round differential characteristics of DES, Matsui branch-and-bound.
+
+a[i] is the input difference of the round function in round i, b[i] its output difference.
+Feistel wiring: a[i+1] = a[i-1] ^ b[i], plaintext difference (L, R) = (a[2] ^ b[1], a[1]),
+difference after n rounds (L, R) = (a[n], a[n+1]).
+Weight of a characteristic is -log2 of its probability, sum over rounds and active S-boxes of
+6 - log2(TDR[j][d][y]). b[1] only sets the plaintext and b[n] only the output difference, so the
+first and the last round take their most probable output and cost lightest(a) of their input.
+a[1] and a[2] are free (any E-consistent input), later inputs follow from the outputs.
+
+Pruning with the memoized best weights W[k] of k-round characteristics: a prefix of i rounds is
+dropped when w(rounds 1..i) + W[n-i] exceeds the bound. While the outputs of round i are chosen
+box by box, every S-box of round i+1 that already gets a nonzero input bit is active and adds at
+least its lightest entry, which prunes most branches before a[i+1] is complete.
+The bound starts at the best (n-1)-round characteristic extended by one round, which is always
+reachable, and tightens to the weight of the worst kept characteristic.
+Round-1 inputs are generated in the parent and searched in worker processes.
+"""
+
+EPS = 1e-9
+
+# Weights and enumeration tables of the 8 stacked TDRs with the E and P wiring
+class Searcher:
+    def __init__(self, tdrs: np.ndarray):
+        tdrs = np.asarray(tdrs, dtype=np.int64)
+        self.boxes, inputs, outputs = tdrs.shape
+        total = float(inputs)
+
+        # rows[j][d] = [(weight, y), ...] by weight, lightest[j][d] = weight of the best output
+        self.rows = [[sorted((float(np.log2(total / tdr[d][y])), y) for y in range(outputs) if tdr[d][y])
+                      for d in range(inputs)] for tdr in tdrs]
+        self.lightest = [[row[0][0] for row in rows] for rows in self.rows]
+        self.minActive = [min(lightest[1:]) for lightest in self.lightest]
+
+        # entries[j][left] = [(weight, d, y), ...] by weight, inputs[j][left] = [(lightest, d), ...]
+        # left = 2 high bits of d, shared with the low bits of box j-1 (box 0 with box 7)
+        self.entries = [[sorted((w, d, y) for d in range(inputs) if d >> 4 == left for w, y in rows[d])
+                         for left in range(4)] for rows in self.rows]
+        self.inputs = [[sorted((lightest[d], d) for d in range(inputs) if d >> 4 == left)
+                        for left in range(4)] for lightest in self.lightest]
+
+        # columns[j][left] = [(lightest, y, [(weight, d), ...]), ...], entries grouped by output y
+        self.columns = [[sorted((group[0][0], y, group) for y, group in
+                                ((y, sorted((w, d) for w, d, z in entries if z == y)) for y in range(outputs)) if group)
+                         for entries in boxEntries] for boxEntries in self.entries]
+
+        # Output difference y of box j after P and the input bits of box j in the next round, as 32-bit ints
+        last = self.boxes - 1
+        self.spread = [[int(des.permute(y << (4 * (last - j)))) for y in range(outputs)] for j in range(self.boxes)]
+        self.outputMask = [spread[outputs - 1] for spread in self.spread]
+        self.inputMask = [sum(1 << (32 - bit) for bit in des.E[6 * j:6 * j + 6]) for j in range(self.boxes)]
+        self.nextBoxes = [(4 * (last - j), self.inputMask[j], self.lightest[j], self.minActive[j]) for j in range(self.boxes)]
+
+        self.bounds = {0: 0.0, 1: 0.0}
+
+    # 6-bit inputs of the 8 S-boxes for F input difference a
+    def boxInputs(self, a: int) -> list:
+        e = ((a & 1) << 33) | (a << 1) | (a >> 31)
+        return [(e >> (4 * (self.boxes - 1 - j))) & 63 for j in range(self.boxes)]
+
+    def lightestWeight(self, a: int) -> float:
+        return sum(self.lightest[j][d] for j, d in enumerate(self.boxInputs(a)) if d)
+
+    def bestOutput(self, a: int) -> int:
+        b = 0
+        for j, d in enumerate(self.boxInputs(a)):
+            if d:
+                b ^= self.spread[j][self.rows[j][d][0][1]]
+        return b
+
+    # Lower bound of round i+1..n when the bits known of a[i+1] are set in v
+    def lookahead(self, n: int, i: int, v: int, known: int) -> float:
+        w = 0.0
+        hot = v & known
+        if hot:
+            e = ((v & 1) << 33) | (v << 1) | (v >> 31)
+            for shift, mask, lightest, minimum in self.nextBoxes:
+                if hot & mask:
+                    w += lightest[(e >> shift) & 63] if known & mask == mask else minimum
+        if i + 1 == n:
+            return w
+        return max(w + self.bounds[n - i - 1], self.bounds[n - i])
+
+    # Inputs a with any E-consistent value and lightestWeight(a) <= budget, as (a, w) lightest first
+    # Box j continues the 2 edge bits of box j-1, box 7 closes the ring with the left edge of box 0
+    def freeInputs(self, budget: float) -> list:
+        last = self.boxes - 1
+        result = []
+        def extend(j: int, first: int, left: int, a: int, w: float):
+            for wd, d in self.inputs[j][left]:
+                if w + wd > budget + EPS:
+                    break
+                if j == last and d & 3 != first:
+                    continue
+                aj = a | (((d >> 1) & 15) << (4 * (last - j)))
+                if j == last:
+                    result.append((aj, w + wd))
+                else:
+                    extend(j + 1, first, d & 3, aj, w + wd)
+        for left in range(4):
+            for wd, d in self.inputs[0][left]:
+                if wd > budget + EPS:
+                    break
+                extend(1, left, d & 3, ((d >> 1) & 15) << (4 * last), wd)
+        result.sort(key=lambda r: r[1])
+        return result
+
+    # Last round n with input a, its best output only sets the output difference
+    def finish(self, previous: int, a: int, rounds: list, w: float, best: 'TopList'):
+        b = self.bestOutput(a)
+        wa = self.lightestWeight(a)
+        best.add(w + wa, rounds + [(a, b, wa)], previous ^ b)
+
+    # Round i (2 < i < n) with input a fixed by the previous rounds
+    def extend(self, n: int, i: int, previous: int, a: int, rounds: list, w: float, best: 'TopList'):
+        count('characteristics.nodes')
+        active = [(j, d) for j, d in enumerate(self.boxInputs(a)) if d]
+        known = 0
+        for j, d in enumerate(self.boxInputs(a)):
+            if not d:
+                known |= self.outputMask[j]
+        rest = [0.0] * (len(active) + 1)
+        for t in range(len(active) - 1, -1, -1):
+            j, d = active[t]
+            rest[t] = rest[t + 1] + self.lightest[j][d]
+        floor = 0.0 if i + 1 == n else self.bounds[n - i]
+
+        def step(t: int, b: int, known: int, wr: float):
+            if t == len(active):
+                if i + 1 == n:
+                    self.finish(a, previous ^ b, rounds + [(a, b, wr)], w + wr, best)
+                else:
+                    self.extend(n, i + 1, a, previous ^ b, rounds + [(a, b, wr)], w + wr, best)
+                return
+            j, d = active[t]
+            knownNext = known | self.outputMask[j]
+            for wy, y in self.rows[j][d]:
+                if w + wr + wy + rest[t + 1] + floor > best.limit + EPS:
+                    break
+                bNext = b ^ self.spread[j][y]
+                if w + wr + wy + rest[t + 1] + self.lookahead(n, i, previous ^ bNext, knownNext) > best.limit + EPS:
+                    continue
+                step(t + 1, bNext, knownNext, wr + wy)
+        if w + rest[0] + self.lookahead(n, i, previous, known) <= best.limit + EPS:
+            step(0, 0, known, 0.0)
+
+    # Searches all characteristics whose round-1 input is one of first, as (a, lightestWeight(a))
+    def searchFrom(self, n: int, first: list, best: 'TopList') -> 'TopList':
+        last = self.boxes - 1
+        floor = 0.0 if n == 3 else self.bounds[n - 2]
+        for a1, w1 in first:
+            if w1 + self.bounds[n - 1] > best.limit + EPS:
+                continue
+            rounds = [(a1, self.bestOutput(a1), w1)]
+            if n == 2:
+                for a2, w2 in self.freeInputs(best.limit - w1):
+                    if a1 or a2:
+                        self.finish(a1, a2, rounds, w1, best)
+                continue
+
+            # Round 2, free input chained over the boxes, a[3] = a[1] ^ b[2] is watched while b[2] grows
+            def ring(j: int, edge: int, left: int, a2: int, b2: int, known: int, w2: float):
+                knownNext = known | self.outputMask[j]
+                for lightest, y, group in self.columns[j][left]:
+                    if w1 + w2 + lightest + floor > best.limit + EPS:
+                        break
+                    bNext = b2 ^ self.spread[j][y]
+                    ahead = self.lookahead(n, 2, a1 ^ bNext, knownNext)
+                    for wd, d in group:
+                        if w1 + w2 + wd + ahead > best.limit + EPS:
+                            break
+                        if j == last and d & 3 != edge:
+                            continue
+                        aNext = a2 | (((d >> 1) & 15) << (4 * (last - j)))
+                        if j < last:
+                            ring(j + 1, edge, d & 3, aNext, bNext, knownNext, w2 + wd)
+                        elif a1 or aNext:
+                            current = rounds + [(aNext, bNext, w2 + wd)]
+                            if n == 3:
+                                self.finish(aNext, a1 ^ bNext, current, w1 + w2 + wd, best)
+                            else:
+                                self.extend(n, 3, aNext, a1 ^ bNext, current, w1 + w2 + wd, best)
+
+            for left in range(4):
+                for wd, d, y in self.entries[0][left]:
+                    if w1 + wd + floor > best.limit + EPS:
+                        break
+                    ring(1, left, d & 3, ((d >> 1) & 15) << (4 * last), self.spread[0][y], self.outputMask[0], wd)
+        return best
+
+
+# Best characteristics seen so far, limit is the weight a new one must not exceed
+class TopList:
+    def __init__(self, size: int, bound: float):
+        self.size = size
+        self.limit = bound
+        self.heap = []
+
+    def add(self, weight: float, rounds: list, last: int):
+        if weight > self.limit + EPS:
+            return
+        item = (-weight, rounds, last)
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, item)
+        else:
+            heapq.heapreplace(self.heap, item)
+        if len(self.heap) == self.size:
+            self.limit = -self.heap[0][0]
+
+    def merge(self, other: 'TopList'):
+        for weight, rounds, last in other.heap:
+            self.add(-weight, rounds, last)
+
+    def sorted(self) -> list:
+        return [(-weight, rounds, last) for weight, rounds, last in sorted(self.heap, reverse=True)]
+
+
+_tdrs = None
+_searcher = None
+
+def _initWorker(tdrs: np.ndarray):
+    global _tdrs
+    _tdrs = tdrs
+
+def _searchTask(task: tuple) -> TopList:
+    global _searcher
+    n, first, size, bound, bounds = task
+    if _searcher is None:
+        _searcher = Searcher(_tdrs)
+    _searcher.bounds.update(bounds)
+    return _searcher.searchFrom(n, first, TopList(size, bound))
+
+
+# Characteristic as a dict: plaintext and n-round differences (L R), round function differences
+def describe(weight: float, rounds: list, last: int) -> dict:
+    a = [r[0] for r in rounds] + [last]
+    return {
+        'rounds': len(rounds),
+        'weight': round(weight, 4),
+        'probability': 2.0 ** -weight,
+        'input': '{:08x} {:08x}'.format(rounds[1][0] ^ rounds[0][1], rounds[0][0]),
+        'output': '{:08x} {:08x}'.format(a[-2], a[-1]),
+        'functions': [{'in': '{:08x}'.format(x), 'out': '{:08x}'.format(y), 'probability': 2.0 ** -w}
+                      for x, y, w in rounds],
+    }
+
+
+# Searches the given round-1 inputs in the pool, returns the merged TopList
+def _search(executor, searcher: Searcher, n: int, size: int, bound: float, chunks: int) -> TopList:
+    first = searcher.freeInputs(bound - searcher.bounds[n - 1])
+    tasks = [(n, first[i::chunks], size, bound, dict(searcher.bounds)) for i in range(min(chunks, len(first)))]
+    best = TopList(size, bound)
+    for found in executor.map(_searchTask, tasks):
+        best.merge(found)
+    return best
+
+# Best weights for 2..rounds rounds (memoized in the cache file) and the top characteristics of rounds
+# rounds, at most slack heavier than the best one
+def searchCharacteristics(tdrs: np.ndarray, rounds: int, top: int = 10, slack: float = 1.0,
+                          workers: int = None, cache: str = None) -> list:
+    tdrs = np.asarray(tdrs, dtype=np.int64)
+    searcher = Searcher(tdrs)
+    digest = hashlib.sha256(tdrs.tobytes()).hexdigest()
+    memo = {}
+    if cache and os.path.exists(cache):
+        with open(cache) as f:
+            stored = json.load(f)
+        if stored.get('tdr') == digest:
+            memo = {int(k): v for k, v in stored['rounds'].items()}
+            logger.debug("Loaded best weights for rounds %s from %s", sorted(memo), cache)
+
+    chunks = 8 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker, initargs=(tdrs,)) as executor:
+        for n in range(2, rounds + 1):
+            if n in memo:
+                searcher.bounds[n] = memo[n]['weight']
+                continue
+
+            # Raise the bound one step at a time, the best (n-1)-round characteristic followed by
+            # its lightest round is always reachable and caps it
+            reachable = searcher.bounds[n - 1] + searcher.lightestWeight(memo[n - 1]['last']) if n - 1 in memo else None
+            bound = searcher.bounds[n - 1]
+            with span('characteristics.round'):
+                while True:
+                    bound += 1.0
+                    if reachable is not None:
+                        bound = min(bound, reachable)
+                    best = _search(executor, searcher, n, 1, bound, chunks)
+                    if best.heap:
+                        break
+                    logger.debug("No %d-round characteristic up to weight %.2f", n, bound)
+
+            weight, characteristic, last = best.sorted()[0]
+            searcher.bounds[n] = weight
+            memo[n] = {'weight': weight, 'last': last, 'characteristic': describe(weight, characteristic, last)}
+            logger.info("Best %d-round characteristic: probability 2^-%.2f", n, weight)
+
+            if cache:
+                with open(cache, 'w') as f:
+                    json.dump({'tdr': digest, 'rounds': memo}, f, indent=2)
+
+        with span('characteristics.top'):
+            best = _search(executor, searcher, rounds, top, searcher.bounds[rounds] + slack, chunks)
+    return [describe(*c) for c in best.sorted()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Best multi-round differential characteristics of DES")
+    parser.add_argument('--rounds', type=int, default=6)
+    parser.add_argument('--top', type=int, default=10, help="number of characteristics to keep")
+    parser.add_argument('--slack', type=float, default=1.0,
+                        help="keep characteristics up to this much weight (-log2 probability) above the best one")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--cache', default='BOUNDS.json', help="memoized best weights per round count")
+    parser.add_argument('--report', help="write the characteristics as JSON")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    tdrs = generateDifferenceTables(readSbox('sboxes.txt'))
+    with span('characteristics.search'):
+        characteristics = searchCharacteristics(tdrs, args.rounds, args.top, args.slack, args.workers, args.cache)
+
+    for c in characteristics:
+        logger.info("Probability 2^-%.2f, input %s, output %s", c['weight'], c['input'], c['output'])
+        for i, f in enumerate(c['functions']):
+            logger.info("  round %d: %s -> %s, probability %.6f", i + 1, f['in'], f['out'], f['probability'])
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(characteristics, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import numpy as np
+
+"""
+DES round function wiring, bits are numbered from 1 (most significant) as in FIPS 46-3.
+F(R, K) = P(S1..S8(E(R) ^ K)), S1 takes the 6 most significant bits of E(R) ^ K.
+All functions work on NumPy uint64 arrays (one value per element) and on Python ints.
+"""
+
+E = [32,  1,  2,  3,  4,  5,
+      4,  5,  6,  7,  8,  9,
+      8,  9, 10, 11, 12, 13,
+     12, 13, 14, 15, 16, 17,
+     16, 17, 18, 19, 20, 21,
+     20, 21, 22, 23, 24, 25,
+     24, 25, 26, 27, 28, 29,
+     28, 29, 30, 31, 32,  1]
+
+P = [16,  7, 20, 21, 29, 12, 28, 17,
+      1, 15, 23, 26,  5, 18, 31, 10,
+      2,  8, 24, 14, 32, 27,  3,  9,
+     19, 13, 30,  6, 22, 11,  4, 25]
+
+P_INVERSE = [P.index(i) + 1 for i in range(1, 33)]
+
+
+# Bit permutation (or expansion) evaluated with one 256-entry lookup table per input byte
+class BitPermutation:
+    def __init__(self, table: list, inputBits: int):
+        self.table = table
+        self.inputBits = inputBits
+        self.outputBits = len(table)
+
+        self.lookups = np.zeros((inputBits // 8, 256), dtype=np.uint64)
+        values = np.arange(256, dtype=np.uint64)
+        for position, source in enumerate(table):
+            byte, bit = divmod(source - 1, 8)
+            bitValue = (values >> np.uint64(7 - bit)) & np.uint64(1)
+            self.lookups[byte] |= bitValue << np.uint64(self.outputBits - 1 - position)
+
+    def __call__(self, values):
+        values = np.asarray(values, dtype=np.uint64)
+        result = np.zeros(values.shape, dtype=np.uint64)
+        for byte, lookup in enumerate(self.lookups):
+            shift = np.uint64(self.inputBits - 8*byte - 8)
+            result |= lookup[((values >> shift) & np.uint64(255)).astype(np.intp)]
+        return result
+
+
+expand = BitPermutation(E, 32)
+permute = BitPermutation(P, 32)
+permuteInverse = BitPermutation(P_INVERSE, 32)
+
+
+# Splits values into count groups of width bits, most significant group first, shape (..., count)
+def split(values, count: int, width: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.uint64)
+    shifts = np.arange(count - 1, -1, -1, dtype=np.uint64) * np.uint64(width)
+    return ((values[..., None] >> shifts) & np.uint64((1 << width) - 1)).astype(np.intp)
+
+# Joins groups of width bits, most significant group first
+def join(groups: np.ndarray, width: int) -> np.ndarray:
+    groups = np.asarray(groups, dtype=np.uint64)
+    count = groups.shape[-1]
+    shifts = np.arange(count - 1, -1, -1, dtype=np.uint64) * np.uint64(width)
+    return np.bitwise_or.reduce(groups << shifts, axis=-1)
+
+# S-box layer, tables has shape (8, 64) in input order (see Sbox.table)
+def substitute(values, tables: np.ndarray) -> np.ndarray:
+    inputs = split(values, 8, 6)
+    outputs = tables[np.arange(8), inputs]
+    return join(outputs, 4)
+
+# DES round function F(R, K) for 32-bit R and 48-bit K
+def feistel(right, key, tables: np.ndarray) -> np.ndarray:
+    return permute(substitute(expand(right) ^ np.uint64(key), tables))
@@ -0,0 +1,173 @@
+import argparse, json, os, sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure, span
+from common.files import saveAtomic, writeAtomic
+from common.boolean import fwht, parity
+
+import logging
+
+import des
+from sboxes import Sbox, readSbox
+from stages import runStages
+
+logger = logging.getLogger(__name__)
+
+"""
+Linear cryptanalysis of the DES S-boxes.
+
+LAT[a][b] = #{x : a.x = b.S(x)} - 2^(n-1), the approximation a.x = b.S(x) holds with
+probability 1/2 + LAT[a][b] / 2^n (bias). Column b is half of the Walsh spectrum of b.S(x).
+
+Matsui's Algorithm 2 on 3-round DES (no IP/FP) with independent random round keys:
+round 1 uses the approximation (a, b) of S-box j, round 2 is inactive, so for
+alpha = R bits seen by a through E and beta = P(b in the output nibble of S-box j)
+    beta.L0 ^ alpha.R0 ^ beta.R3 ^ beta.F(L3, K3) = a.K1[j]   with probability 1/2 + bias
+beta.F(L3, K3) depends only on the 6 key bits of S-box j in round 3, which are guessed.
+Samples are reduced to a 128-bin histogram over (E(L3)[j], known bits) so every key guess
+is counted with one 64 x 64 table instead of a pass over the samples.
+"""
+
+#Generate LAT tables for sboxes of the same size at once, shape (sboxes, 2^n, 2^m)
+def generateApproximationTables(sboxes: list) -> np.ndarray:
+    logger.debug("Generating LAT for %d sboxes", len(sboxes))
+    n, m = sboxes[0].inputBits, sboxes[0].outputBits
+    if any((sbox.inputBits, sbox.outputBits) != (n, m) for sbox in sboxes):
+        raise ValueError("Sboxes must have the same size to be stacked")
+
+    with span('lab2.lat'):
+        tables = np.stack([sbox.table for sbox in sboxes]).astype(np.uint64)
+        masks = np.arange(1 << m, dtype=np.uint64)
+        components = parity(tables[:, None, :] & masks[None, :, None])
+        spectrum = fwht(1 - 2*components)
+    return (spectrum // 2).transpose(0, 2, 1)
+
+# Best approximations over the whole LAT as (a, b, LAT, bias), largest |LAT| first, a = 0 and b = 0 are skipped
+def bestApproximations(lat: np.ndarray, n: int) -> list:
+    lat = np.asarray(lat)
+    rows, columns = lat.shape
+    a, b = np.nonzero(lat[1:, 1:])
+    a, b = a + 1, b + 1
+    order = np.lexsort((b, a, -np.abs(lat[a, b])))[:n]
+    return [(int(a[i]), int(b[i]), int(lat[a[i], b[i]]), float(lat[a[i], b[i]]) / rows) for i in order]
+
+#Saves LAT.npy and BLA (best linear approximations) in the sbox directory, LAT.txt only when text is set
+def saveApproximationTables(sbox: Sbox, lat: np.ndarray, n: int = 5, text: bool = False) -> list:
+    sbox.createDirectory()
+    with span('lab2.writeTables'):
+        saveAtomic(sbox.getPath('LAT.npy'), lat)
+    if text:
+        with span('lab2.writeText'):
+            writeAtomic(sbox.getPath('LAT.txt'), ''.join(str(row) + '\n' for row in lat.tolist()))
+
+    best = bestApproximations(lat, n)
+    sbox.saveInDirectory('BLA', str(best))
+    return best
+
+
+# R bits read by input mask a of S-box box through E, as a 32-bit mask
+def inputMask(box: int, a: int) -> int:
+    return sum(1 << (32 - des.E[6*box + p]) for p in range(6) if a >> (5 - p) & 1)
+
+# Worker: encrypts one chunk of known plaintexts and returns the (E(L3)[box], known bits) histogram
+def sampleChunk(task: dict) -> np.ndarray:
+    rng = np.random.default_rng(task['seed'])
+    count, tables, keys, box = task['count'], task['tables'], task['keys'], task['box']
+    alpha, beta = np.uint64(task['alpha']), np.uint64(task['beta'])
+
+    left = rng.integers(0, 1 << 32, count, dtype=np.uint64)
+    right = rng.integers(0, 1 << 32, count, dtype=np.uint64)
+    known = parity((left & beta) | ((right & alpha) << np.uint64(32)))
+    for key in keys:
+        left, right = right, left ^ des.feistel(right, key, tables)
+
+    known ^= parity(right & beta)
+    inputs = des.split(des.expand(left), 8, 6)[:, box]
+    return np.bincount(inputs * 2 + known, minlength=128)
+
+# Number of samples where the approximation sums to 0, for every 6-bit key guess of S-box box
+def keyCounts(histogram: np.ndarray, table: np.ndarray, b: int) -> np.ndarray:
+    x = np.arange(64)
+    f = parity(np.asarray(table, dtype=np.uint64) & np.uint64(b))
+    guessed = f[x[:, None] ^ x[None, :]]
+    histogram = histogram.reshape(64, 2)
+    return np.where(guessed == 0, histogram[None, :, 0], histogram[None, :, 1]).sum(axis=1)
+
+# Runs Algorithm 2 with doubling numbers of samples up to samples, returns the rank history
+def simulate(samples: int = 1 << 16, box: int = None, approximation: tuple = None, seed: int = 0,
+             workers: int = None, chunk: int = 1 << 16, fileName: str = 'sboxes.txt') -> dict:
+    sboxes = readSbox(fileName)
+    tables = np.stack([sbox.table for sbox in sboxes]).astype(np.int64)
+    lats = generateApproximationTables(sboxes)
+
+    if box is None:
+        box = int(np.argmax([abs(bestApproximations(lat, 1)[0][2]) for lat in lats])) + 1
+    j = box - 1
+    a, b = approximation if approximation is not None else bestApproximations(lats[j], 1)[0][:2]
+    bias = float(lats[j][a][b]) / 64
+    alpha = inputMask(j, a)
+    beta = int(des.permute(b << (4 * (7 - j))))
+    logger.info("S%d approximation %d -> %d, bias %.4f, alpha %08x, beta %08x", box, a, b, bias, alpha, beta)
+
+    rng = np.random.default_rng(seed)
+    keys = [int(k) for k in rng.integers(0, 1 << 48, 3, dtype=np.uint64)]
+    key = int(des.split(keys[2], 8, 6)[j])
+    keyBit = bin(a & int(des.split(keys[0], 8, 6)[j])).count('1') & 1
+
+    task = {'tables': tables, 'keys': keys, 'box': j, 'alpha': alpha, 'beta': beta}
+    history = []
+    for stage, histogram in runStages(sampleChunk, task, np.zeros(128, dtype=np.int64), samples, seed, workers,
+                                      chunk, 'linear.stage'):
+        counts = keyCounts(histogram, tables[j], b)
+        scores = np.abs(2*counts - stage)
+        best = int(np.argmax(scores))
+        entry = {
+            'samples': stage,
+            'rank': int(np.count_nonzero(scores >= scores[key])),
+            'bestKey': best,
+            'keyBit': int((counts[best] * 2 > stage) == (bias < 0)),
+        }
+        logger.info("Samples %d: true key rank %d, best key %d, key bit %d", stage, entry['rank'], best, entry['keyBit'])
+        history.append(entry)
+
+    return {
+        'box': box,
+        'approximation': [a, b],
+        'bias': bias,
+        'key': key,
+        'keyBit': keyBit,
+        'history': history,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Linear cryptanalysis of the DES S-boxes in sboxes.txt")
+    parser.add_argument('--text', action='store_true', help="also write LAT as text")
+    parser.add_argument('--samples', type=int, default=1 << 16, help="known plaintexts for Algorithm 2, 0 to skip it")
+    parser.add_argument('--box', type=int, help="S-box attacked by Algorithm 2, default the one with the largest bias")
+    parser.add_argument('--approximation', type=int, nargs=2, metavar=('A', 'B'),
+                        help="input and output mask, default the best one of the S-box")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunk', type=int, default=1 << 16)
+    parser.add_argument('--report', help="write the Algorithm 2 rank history as JSON")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    sboxes = readSbox('sboxes.txt')
+    for sbox, lat in zip(sboxes, generateApproximationTables(sboxes)):
+        best = saveApproximationTables(sbox, lat, 5, args.text)
+        logger.info("%s best approximations (a, b, LAT, bias): %s", sbox.getSboxName(), best)
+
+    if args.samples:
+        result = simulate(args.samples, args.box, args.approximation, args.seed, args.workers, args.chunk)
+        logger.info("True key %d, key bit %d", result['key'], result['keyBit'])
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(result, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,138 +1,108 @@
-import re, os
+import argparse, json, math, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Tuple
 
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure, span
+from common.files import saveAtomic, writeAtomic
+from common.cache import memoize
+
+from pairs import PairTable
+from sboxes import Sbox, readSbox, generateDifferenceTables
+
 import logging
 
-#logging configuration 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-
-class Sbox:
-    def __init__(self, number: int, array: list):
-        logging.info("Initializing Sbox")
-        
-        self.number = number
-        self.array = array
-        
-        self.createDirectory()
-
-    def getValueAtSi(self, place: int) -> int:
-        binary = format(place, "06b")
-        r = ""+str(binary[0]) + str(binary[5])
-        c = ""+str(binary[1]) + str(binary[2]) + str(binary[3]) + str(binary[4])
-        return self.array[int(r, 2)][int(c, 2)]
-
-    def createDirectory(self):
-        if not os.path.exists(self.getSboxName()):
-            os.makedirs(self.getSboxName())
-
-    def getSboxName(self) -> str:
-        return 'SBOX' + str(self.number)
-
-    def saveInDirectory(self, fileName: str, data: str):
-        with open(self.getSboxName() + '/' + fileName + '.txt', 'w') as f:
-            f.write(data)
-
-    def __str__(self):
-        return self.getSboxName() + '\n' + '\n'.join(' '.join(str(x) for x in y) for y in self.array)
-
-    def __repr__(self):
-        return str(self)
-
-#Reads the file and returns a list of Sbox
-def readSbox(fileName: str) -> list:
-    logging.info("Reading Sbox")
-    result = []
-    with open(fileName, 'r') as f:
-        file = f.readlines()
-    
-    size = int(len(file) / 5)
-    for i in range(size):
-        sbox = []
-        for j in range(1, 5):
-            line = file[i*5+j]
-            sbox.append([int(s) for s in re.findall(r'\b\d+\b', line)])
-        result.append(Sbox(i+1,sbox))
-    return result
+logger = logging.getLogger(__name__)
 
-#Generate TDR and TZP tables for sbox
-def generateTables(sbox: Sbox) -> Tuple[list, list] :
-    logging.info("Generating tables")
-
-    tdr, tzp = [], []
-    for i in range(64):
-        tdr.append(list(0 for j in range(16)))
-        tzp.append(list(list() for j in range(16)))
-
-    for x1 in range(64):
-        for x2 in range(64):
-            so = x1 ^ x2
-            y1 = sbox.getValueAtSi(x1)
-            y2 = sbox.getValueAtSi(x2)
-            si = y1 ^ y2
-            tdr[so][si] += 1
-            tzp[so][si].append((x1, x2))
-
-    with open(sbox.getSboxName() + '/TDR.txt', 'w') as f:
-        for i in range(64):
-            f.write(str(tdr[i]) + '\n')
-    
-    with open(sbox.getSboxName() + '/TZP.txt', 'w') as f:
-        for i in range(64):
-            f.write(str(tzp[i]) + '\n')
+# Largest default number of sboxes per task
+GROUP = 8
+
+#Generate TDR and TZP tables for sbox, tdr can be taken from generateDifferenceTables
+#Tables are saved as TDR.npy and TZP_pairs.npy/TZP_offsets.npy, text dumps only when text is set
+def generateTables(sbox: Sbox, tdr: np.ndarray = None, text: bool = False) -> Tuple[list, PairTable] :
+    logger.debug("Generating tables for %s", sbox.getSboxName())
+
+    # TDR and TZP are cached by the sbox table
+    def compute():
+        table = generateDifferenceTables([sbox])[0] if tdr is None else np.asarray(tdr)
+        with span('lab2.tzp'):
+            pairs = PairTable.fromTable(sbox.table, table)
+        return table, pairs.pairs, pairs.offsets
+
+    tdr, pairs, offsets = memoize('lab2.tables', [sbox.table], {}, compute)
+    tzp = PairTable(pairs, offsets, tdr.shape[1])
+
+    sbox.createDirectory()
+    with span('lab2.writeTables'):
+        # Entries are at most 2^n, stored in the smallest unsigned dtype that holds them
+        saveAtomic(sbox.getPath('TDR.npy'), tdr.astype(np.min_scalar_type(tdr.shape[0])))
+        tzp.save(sbox.getPath('TZP'))
+
+    tdr = tdr.tolist()
+    if text:
+        with span('lab2.writeText'):
+            writeAtomic(sbox.getPath('TDR.txt'), ''.join(str(row) + '\n' for row in tdr))
+            writeAtomic(sbox.getPath('TZP.txt'), tzp.toText())
 
     return tdr, tzp
 
-# Highest pair indexes 
+#Loads the binary tables written by generateTables, memory-mapped
+def loadTables(sbox: Sbox) -> Tuple[np.ndarray, PairTable]:
+    tdr = np.load(sbox.getPath('TDR.npy'), mmap_mode='r')
+    return tdr, PairTable.load(sbox.getPath('TZP'), tdr.shape[1])
+
+# Highest pair indexes over the whole TDR as (so, si, probability), row so = 0 is skipped
+# Ties are broken by so and then si, zero entries are never returned
 def highestPairIndexes(tdr: list, n: int) -> list:
-    logging.info("Getting highest pair indexes")
-    hV = [0] * n
-    hI = [(0, 0)] * n
-
-    for i in range(n):
-        for j in range(len(tdr)):
-            row = tdr[j]
-            highest = max(row)
-            if highest != 64:
-                for k in range(n):
-                    if hV[k] < highest and (j, row.index(highest)) not in hI:
-                        hI[k] = (j, row.index(highest))
-                        hV[k] = highest
-                        break
-    return hI
-
-# Function for pair (x1, x2) based on tzp table
-def pairFromIndex(tzp: list, row: list) -> list:
-    logging.info("Getting pair from index")
+    logger.debug("Getting %d highest pair indexes", n)
+    tdr = np.asarray(tdr)
+    rows, columns = tdr.shape
+    values = tdr[1:].ravel()
+
+    k = min(n, int(np.count_nonzero(values)))
+    if k == 0:
+        return []
+    threshold = np.partition(values, values.size - k)[values.size - k]
+    above = np.flatnonzero(values > threshold)
+    ties = np.flatnonzero(values == threshold)[:k - len(above)]
+    chosen = np.concatenate((above, ties))
+    chosen = chosen[np.lexsort((chosen, -values[chosen]))]
+
+    return [(int(c // columns) + 1, int(c % columns), float(values[c]) / rows) for c in chosen]
+
+# Function for pair (x1, x2) based on tzp table, every element is a view of the x1 values of a cell
+def pairFromIndex(tzp: PairTable, row: list) -> list:
+    logger.debug("Getting pair from index")
     pair = []
 
     for r in row:
-        pair.append(tzp[r[0]][r[1]])
+        pair.append(tzp[r[0], r[1]])
     return pair
 
-# Creates keys based on pair and row
+# Text form of pairFromIndex result as lists of (x1, x2) tuples
+def pairsToText(pair: list, row: list) -> str:
+    return str([[(x1, x1 ^ r[0]) for x1 in p.tolist()] for p, r in zip(pair, row)])
+
+# Creates keys based on pair and row, cached by the pairs
 def getKeys(pair: list, row: list) -> dict:
-    logging.info("Getting keys")
-    keys = []
-
-    for r, c in zip(pair, row):
-        for p in r:
-            x1, x2 = 1, 0
-            while x1 ^ x2 != c[0]:
-                x2 += 1
-            keys.append(p[0] ^ x1)
-    
-    result = dict()
-    for key in keys:
-        if key in result:
-            result[key] += 1
-        else:
-            result[key] = 1
-    
-    return dict(sorted(result.items(), key=lambda x: x[1], reverse=True))
+    logger.debug("Getting keys")
+    pair = [np.asarray(p) for p in pair]
+    return memoize('lab2.keys', pair, {}, lambda: _rankKeys(pair))
+
+def _rankKeys(pair: list) -> dict:
+    # Key candidate is x1 ^ 1 for every pair (the former search for x1 ^ x2 = so always stopped at x1 = 1)
+    keys = np.concatenate([np.asarray(p, dtype=np.int64) for p in pair] or [np.zeros(0, dtype=np.int64)]) ^ 1
+    values, first, counts = np.unique(keys, return_index=True, return_counts=True)
+
+    # Highest count first, ties in order of first appearance
+    order = np.lexsort((first, -counts))
+    return dict(zip(values[order].tolist(), counts[order].tolist()))
     
 # Gets n best keys from given keys dictionary
 def getNBestKeys(keys: dict, n: int) -> dict:
-    logging.info("Getting n best keys")
+    logger.debug("Getting n best keys")
     result = dict()
     i = 0
     for key in keys.items():
@@ -142,28 +112,94 @@ def getNBestKeys(keys: dict, n: int) -> dict:
     
     return result
 
-#Main function
-def main():
-    logging.info("Starting main")
+#Runs every step for a group of sboxes (TDR stacked for the group), returns one manifest entry per sbox
+def analyzeSboxes(sboxes: list, text: bool = False) -> list:
+    entries = []
+    tdrs = generateDifferenceTables(sboxes)
+    for sbox, tdr in zip(sboxes, tdrs):
+        logger.info("%s", sbox)
+        start = time.perf_counter()
 
-    sboxes = readSbox('sboxes.txt')
-    for sbox in sboxes:
-        logging.info(sbox)
+        with span('lab2.generateTables'):
+            tdr, tzp = generateTables(sbox, tdr, text)
 
-        tdr, tzp = generateTables(sbox)
-
-        row = highestPairIndexes(tdr, 5)
+        with span('lab2.highestPairIndexes'):
+            row = highestPairIndexes(tdr, 5)
         sbox.saveInDirectory('HPI', str(row))
 
         pair = pairFromIndex(tzp, row)
-        sbox.saveInDirectory('PFI', str(pair))
+        sbox.saveInDirectory('PFI', pairsToText(pair, row))
 
-        keys = getKeys(pair, row)
+        with span('lab2.getKeys'):
+            keys = getKeys(pair, row)
         sbox.saveInDirectory('KEYS', str(keys))
 
         bestKeys = getNBestKeys(keys, 5)
         sbox.saveInDirectory('BESTKEYS', str(bestKeys))
 
+        entries.append({
+            'sbox': sbox.getSboxName(),
+            'directory': sbox.getDirectory(),
+            'files': ['TDR.npy', 'TZP_pairs.npy', 'TZP_offsets.npy'] + (['TDR.txt', 'TZP.txt'] if text else [])
+                     + ['HPI.txt', 'PFI.txt', 'KEYS.txt', 'BESTKEYS.txt'],
+            'differentialUniformity': max(max(row) for row in tdr[1:]),
+            'highestPairIndexes': row,
+            'bestKeys': bestKeys,
+            'seconds': time.perf_counter() - start,
+        })
+    return entries
+
+# Worker: the sboxes of one group are parsed by the parent and sent with the task
+def _analyzeTask(task: tuple) -> list:
+    sboxes, text = task
+    return analyzeSboxes(sboxes, text)
+
+# Output directory of an sbox file, sboxes.txt keeps writing SBOXn next to it, other files get <name>/SBOXn
+def outputDirectory(fileName: str) -> str:
+    if os.path.basename(fileName) == 'sboxes.txt':
+        return os.path.dirname(fileName)
+    return os.path.splitext(fileName)[0]
+
+#Main function
+def main():
+    parser = argparse.ArgumentParser(description="Differential cryptanalysis of the DES S-boxes in sboxes.txt")
+    parser.add_argument('files', nargs='*', default=['sboxes.txt'], help="sbox files, default sboxes.txt")
+    parser.add_argument('--text', action='store_true', help="also write TDR and TZP as text")
+    parser.add_argument('--workers', type=int, default=1, help="processes, sboxes are processed in groups of --group")
+    parser.add_argument('--group', type=int, help="sboxes per task, their TDRs are built at once, "
+                                                  "default 8 or fewer so every worker gets a task")
+    parser.add_argument('--manifest', default='MANIFEST.json', help="summary of every sbox written at the end")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+    logger.info("Starting main")
+    start = time.perf_counter()
+
+    tasks = []
+    for fileName in args.files:
+        sboxes = readSbox(fileName, outputDirectory(fileName))
+        group = args.group or max(1, min(GROUP, math.ceil(len(sboxes) / args.workers)))
+        tasks += [(sboxes[first:first + group], args.text) for first in range(0, len(sboxes), group)]
+
+    entries = []
+    if args.workers == 1:
+        for task in tasks:
+            entries += _analyzeTask(task)
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for result in executor.map(_analyzeTask, tasks):
+                entries += result
+
+    manifest = {
+        'files': args.files,
+        'sboxes': len(entries),
+        'workers': args.workers,
+        'seconds': time.perf_counter() - start,
+        'results': entries,
+    }
+    writeAtomic(args.manifest, json.dumps(manifest, indent=2))
+    logger.info("Analyzed %d sboxes in %.2f s, manifest written to %s", len(entries), manifest['seconds'], args.manifest)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
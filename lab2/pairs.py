@@ -0,0 +1,64 @@
+import os, sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.files import saveAtomic
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+TZP stored in CSR layout:
+pairs   - x1 of every pair (x1, x2), sorted by cell so * columns + si and by x1 inside a cell
+offsets - cell c holds pairs[offsets[c]:offsets[c+1]], len(offsets) = rows * columns + 1
+x2 is not stored, it is x1 ^ so.
+Saved as <name>_pairs.npy and <name>_offsets.npy, loaded memory-mapped without parsing.
+"""
+
+class PairTable:
+    def __init__(self, pairs: np.ndarray, offsets: np.ndarray, columns: int):
+        self.pairs = pairs
+        self.offsets = offsets
+        self.columns = columns
+        self.rows = (len(offsets) - 1) // columns
+
+    # Builds the table from an S-box lookup table and its TDR
+    @staticmethod
+    def fromTable(table: np.ndarray, tdr: np.ndarray) -> 'PairTable':
+        rows, columns = tdr.shape
+        x = np.arange(rows)
+        x1 = np.repeat(x, rows)
+        x2 = np.tile(x, rows)
+        cells = (x1 ^ x2) * columns + (table[x1].astype(np.int64) ^ table[x2])
+        order = np.argsort(cells, kind='stable')
+        pairs = x1[order].astype(np.uint8 if rows <= 256 else np.uint16)
+        offsets = np.concatenate(([0], np.cumsum(tdr.ravel()))).astype(np.int64)
+        return PairTable(pairs, offsets, columns)
+
+    # x1 values of cell (so, si) as a view, x2 = x1 ^ so
+    def __getitem__(self, index: tuple) -> np.ndarray:
+        so, si = index
+        cell = so * self.columns + si
+        return self.pairs[self.offsets[cell]:self.offsets[cell + 1]]
+
+    # (x1, x2) tuples of a cell, for text export
+    def cellPairs(self, so: int, si: int) -> list:
+        x1 = self[so, si].tolist()
+        return [(a, a ^ so) for a in x1]
+
+    def save(self, path: str):
+        saveAtomic(path + '_pairs.npy', self.pairs)
+        saveAtomic(path + '_offsets.npy', self.offsets)
+
+    @staticmethod
+    def load(path: str, columns: int) -> 'PairTable':
+        logger.debug("Loading pair table %s", path)
+        pairs = np.load(path + '_pairs.npy', mmap_mode='r')
+        offsets = np.load(path + '_offsets.npy', mmap_mode='r')
+        return PairTable(pairs, offsets, columns)
+
+    # Same text as str() of the former 64 x 16 nested lists of tuples, one row per line
+    def toText(self) -> str:
+        return ''.join(str([self.cellPairs(so, si) for si in range(self.columns)]) + '\n' for so in range(self.rows))
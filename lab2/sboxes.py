@@ -0,0 +1,97 @@
+import re, os, sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import span
+from common.files import writeAtomic
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Sbox:
+    def __init__(self, number: int, array: list, outputBits: int = None, directory: str = ''):
+        logger.debug("Initializing Sbox %d", number)
+        
+        self.number = number
+        self.directory = directory
+        self.array = array
+        self.table = self.createTable()
+        self.inputBits = len(self.table).bit_length() - 1
+        self.outputBits = outputBits if outputBits is not None else max(1, int(self.table.max()).bit_length())
+
+    # Sbox given as a flat lookup table of any n -> m size, entry x is the output for input x
+    @staticmethod
+    def fromTable(number: int, table: list, outputBits: int = None) -> 'Sbox':
+        return Sbox(number, [list(table)], outputBits)
+
+    # Flat lookup table, DES layout (4 rows of 16) is addressed by row = b5 b0, column = b4 b3 b2 b1
+    def createTable(self) -> np.ndarray:
+        array = np.array(self.array, dtype=np.int64)
+        if array.shape == (4, 16):
+            x = np.arange(64)
+            table = array[((x >> 4) & 2) | (x & 1), (x >> 1) & 15]
+        else:
+            table = array.ravel()
+        if len(table) == 0 or len(table) & (len(table) - 1):
+            raise ValueError("Sbox {} size must be a power of two, got {}".format(self.number, len(table)))
+        return table.astype(np.uint8 if table.max() < 256 else np.uint16)
+
+    def getValueAtSi(self, place: int) -> int:
+        return int(self.table[place])
+
+    # Output directory is created by the writers, not when the Sbox is built
+    def createDirectory(self):
+        os.makedirs(self.getDirectory(), exist_ok=True)
+
+    def getSboxName(self) -> str:
+        return 'SBOX' + str(self.number)
+
+    def getDirectory(self) -> str:
+        return os.path.join(self.directory, self.getSboxName())
+
+    def getPath(self, fileName: str) -> str:
+        return os.path.join(self.getDirectory(), fileName)
+
+    def saveInDirectory(self, fileName: str, data: str):
+        self.createDirectory()
+        writeAtomic(self.getPath(fileName + '.txt'), data)
+
+    def __str__(self):
+        return self.getSboxName() + '\n' + '\n'.join(' '.join(str(x) for x in y) for y in self.array)
+
+    def __repr__(self):
+        return str(self)
+
+#Reads the file and returns a list of Sbox, their outputs go to directory/SBOXn
+def readSbox(fileName: str, directory: str = '') -> list:
+    logger.debug("Reading Sbox from %s", fileName)
+    result = []
+    with open(fileName, 'r') as f:
+        file = f.readlines()
+    
+    size = int(len(file) / 5)
+    for i in range(size):
+        sbox = []
+        for j in range(1, 5):
+            line = file[i*5+j]
+            sbox.append([int(s) for s in re.findall(r'\b\d+\b', line)])
+        result.append(Sbox(i+1,sbox,directory=directory))
+    return result
+
+#Generate TDR tables for sboxes of the same size at once, shape (sboxes, 2^n, 2^m)
+def generateDifferenceTables(sboxes: list) -> np.ndarray:
+    logger.debug("Generating TDR for %d sboxes", len(sboxes))
+    n, m = sboxes[0].inputBits, sboxes[0].outputBits
+    if any((sbox.inputBits, sbox.outputBits) != (n, m) for sbox in sboxes):
+        raise ValueError("Sboxes must have the same size to be stacked")
+
+    with span('lab2.ddt'):
+        tables = np.stack([sbox.table for sbox in sboxes]).astype(np.int64)
+        x = np.arange(1 << n)
+        so = x[:, None] ^ x[None, :]
+        si = tables[:, :, None] ^ tables[:, None, :]
+        cells = (np.arange(len(sboxes))[:, None, None] << (n + m)) | (so << m)[None] | si
+        counts = np.bincount(cells.ravel(), minlength=len(sboxes) << (n + m))
+    return counts.reshape(len(sboxes), 1 << n, 1 << m)
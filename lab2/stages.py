@@ -0,0 +1,42 @@
+import os, sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import span
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+"""
+Stage schedule shared by the key recovery simulators (attack.py and linear.py).
+
+A simulation of total samples reports after 64, 128, 256, ... samples and at total. The samples
+of every stage are split into chunks of at most chunk, each chunk gets its own child of one
+SeedSequence and the chunk histograms are summed. The chunks only depend on seed, total and
+chunk, so the histograms and ranks do not depend on the number of workers.
+"""
+
+# Sample counts after which the ranks are reported, powers of two from 64 below total, then total
+def stageSizes(total: int) -> list:
+    return sorted(set([1 << s for s in range(6, total.bit_length()) if 1 << s < total] + [total]))
+
+# Runs function over chunks of every stage in a process pool and yields (stage, histogram) after
+# each stage. function takes the task dict with 'seed' and 'count' added and returns an array
+# of the shape of histogram, which is updated in place.
+def runStages(function, task: dict, histogram: np.ndarray, total: int, seed: int, workers: int = None,
+              chunk: int = 1 << 16, name: str = 'stages.stage'):
+    seeds = np.random.SeedSequence(seed)
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for stage in stageSizes(total):
+            sizes = [min(chunk, stage - start) for start in range(done, stage, chunk)]
+            tasks = [dict(task, seed=childSeed, count=size) for size, childSeed in zip(sizes, seeds.spawn(len(sizes)))]
+            logger.debug("Stage %d: %d chunks", stage, len(tasks))
+            with span(name):
+                for result in executor.map(function, tasks):
+                    histogram += result
+            done = stage
+            yield stage, histogram
@@ -0,0 +1,295 @@
+import argparse, hashlib, json, math, os, sys, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure, span, count
+from common.files import writeAtomic
+
+import logging
+
+from keccak_batch import keccak_p_lanes
+from keccak_tables import VARIANTS
+
+logger = logging.getLogger(__name__)
+
+"""
+Parallel collision search (van Oorschot - Wiener) on t-bit truncations of the lab3 SHA-3 functions.
+
+f(x) = first t bits of H(x as ceil(t/8) little-endian bytes), 32 <= t <= 64 in practice. The message
+is a single block, so f is evaluated by writing x, the domain suffix and the final pad bit straight
+into lane-major states and running the batched Keccak-f[1600] on every trail at once.
+
+Every worker walks trails x -> f(x) in lockstep until a trail reaches a distinguished point (its low
+dbits bits are zero), reports (point, start, length) and restarts the trail from a random point.
+Trails longer than TRAIL_LIMIT / theta are dropped as probable cycles. The trails of a worker live
+in the process between tasks, so no walk is thrown away at a task boundary.
+
+The main process keeps the distinguished points in a direct-mapped table of fixed capacity (point,
+start, length and a used flag, 21 bytes per slot). A new point overwrites the slot of an older one,
+which bounds memory like the memory-limited variant of the algorithm. Two trails ending in the same point are re-walked from
+their starts, the longer one first by the length difference, until their images meet: the two
+preimages are a collision unless one start lay on the other trail. Re-walks use hashlib, which is
+bit-exact with f and much faster for a single message, and every pair is checked again with f.
+
+The expected number of evaluations for k collisions is sqrt(pi N / 2) for k = 1 and about sqrt(2kN)
+otherwise, N = 2^t, plus about (trails in flight) / theta evaluations to notice the merge.
+"""
+
+# Trails longer than this many expected trail lengths are abandoned
+TRAIL_LIMIT = 20
+
+_walk = None
+
+# First t bits of the digest of every element of x (uint64) as a t-bit message of ceil(t/8) bytes
+def truncated_hash(x: np.ndarray, t: int, name: str = 'sha3_256') -> np.ndarray:
+    c, d, suffix = VARIANTS[name]
+    r, size = (1600 - c) // 8, (t + 7) // 8
+    x = np.asarray(x, dtype=np.uint64)
+    A = np.zeros((25, len(x)), dtype=np.uint64)
+    A[0] = x
+    A[size // 8] ^= np.uint64(suffix << (8 * (size % 8)))
+    A[r // 8 - 1] ^= np.uint64(0x80 << 56)
+    keccak_p_lanes(A, 64, 24)
+    return A[0] & np.uint64((1 << t) - 1)
+
+# The same function for one value through hashlib, used to re-walk merged trails
+def scalar_hash(x: int, t: int, name: str = 'sha3_256') -> int:
+    hash = hashlib.new(name, x.to_bytes((t + 7) // 8, 'little'))
+    digest = hash.digest(8) if VARIANTS[name][1] is None else hash.digest()
+    return int.from_bytes(digest[:8], 'little') & ((1 << t) - 1)
+
+# Worker: advances the trails of this process by steps evaluations each, returns the distinguished points
+def walk_task(task: dict) -> dict:
+    global _walk
+    t, name, dbits, trails = task['t'], task['name'], task['dbits'], task['trails']
+    rng = np.random.default_rng(task['seed'])
+    key = (t, name, dbits, trails)
+    if _walk is None or _walk['key'] != key:
+        start = rng.integers(0, 1 << t, trails, dtype=np.uint64)
+        _walk = {'key': key, 'start': start, 'current': start.copy(), 'length': np.zeros(trails, dtype=np.int64)}
+    start, current, length = _walk['start'], _walk['current'], _walk['length']
+
+    mask = np.uint64((1 << dbits) - 1)
+    limit = TRAIL_LIMIT << dbits
+    points, starts, lengths = [], [], []
+    dropped = 0
+    with span('collision.walk'):
+        for _ in range(task['steps']):
+            current[:] = truncated_hash(current, t, name)
+            length += 1
+            hit = (current & mask) == 0
+            done = hit | (length > limit)
+            if not done.any():
+                continue
+            points.append(current[hit])
+            starts.append(start[hit])
+            lengths.append(length[hit])
+            dropped += int(length[done & ~hit].sum())
+
+            fresh = rng.integers(0, 1 << t, int(done.sum()), dtype=np.uint64)
+            start[done] = fresh
+            current[done] = fresh
+            length[done] = 0
+    count('collision.evaluations', trails * task['steps'])
+
+    return {
+        'points': np.concatenate(points) if points else np.zeros(0, dtype=np.uint64),
+        'starts': np.concatenate(starts) if starts else np.zeros(0, dtype=np.uint64),
+        'lengths': np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64),
+        'evaluations': trails * task['steps'],
+        'dropped': dropped,
+    }
+
+
+# Direct-mapped table of distinguished points with their trail start and length
+class PointTable:
+    def __init__(self, capacity: int, dbits: int):
+        self.capacity = 1 << max(0, (capacity - 1).bit_length())
+        self.dbits = dbits
+        self.points = np.zeros(self.capacity, dtype=np.uint64)
+        self.starts = np.zeros(self.capacity, dtype=np.uint64)
+        self.lengths = np.zeros(self.capacity, dtype=np.uint32)
+        self.used = np.zeros(self.capacity, dtype=bool)
+        self.stored = 0
+        self.overwritten = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.points.nbytes + self.starts.nbytes + self.lengths.nbytes + self.used.nbytes
+
+    # Stores a batch of points, returns the merges as (start, length, start, length) of two trails
+    def insert(self, points: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> list:
+        merges = []
+        order = np.argsort(points, kind='stable')
+        points, starts, lengths = points[order], starts[order], lengths[order]
+
+        # Points reached twice inside the batch
+        repeated = np.flatnonzero(points[1:] == points[:-1])
+        for i in repeated.tolist():
+            merges.append((int(starts[i]), int(lengths[i]), int(starts[i + 1]), int(lengths[i + 1])))
+        first = np.ones(len(points), dtype=bool)
+        first[repeated + 1] = False
+        points, starts, lengths = points[first], starts[first], lengths[first]
+
+        # Points already in the table
+        slots = ((points >> np.uint64(self.dbits)) & np.uint64(self.capacity - 1)).astype(np.intp)
+        found = self.used[slots] & (self.points[slots] == points)
+        for i in np.flatnonzero(found).tolist():
+            slot = slots[i]
+            merges.append((int(self.starts[slot]), int(self.lengths[slot]), int(starts[i]), int(lengths[i])))
+
+        new = ~found
+        occupied = int(np.count_nonzero(self.used[slots[new]]))
+        self.overwritten += occupied
+        self.stored += int(np.count_nonzero(new)) - occupied
+        self.points[slots[new]] = points[new]
+        self.starts[slots[new]] = starts[new]
+        self.lengths[slots[new]] = lengths[new]
+        self.used[slots[new]] = True
+        return merges
+
+# Re-walks two trails that end in the same point, returns ((x, y) or None, evaluations)
+def resolve(merge: tuple, t: int, name: str) -> tuple:
+    a, length_a, b, length_b = merge
+    if length_a < length_b:
+        a, length_a, b, length_b = b, length_b, a, length_a
+    evaluations = 0
+    for _ in range(length_a - length_b):
+        a = scalar_hash(a, t, name)
+        evaluations += 1
+    if a == b:
+        return None, evaluations
+
+    for _ in range(length_b):
+        next_a, next_b = scalar_hash(a, t, name), scalar_hash(b, t, name)
+        evaluations += 2
+        if next_a == next_b:
+            return (a, b), evaluations
+        a, b = next_a, next_b
+    return None, evaluations
+
+# Expected evaluations for k collisions of a random function on 2^t points
+def expected_evaluations(t: int, k: int = 1) -> float:
+    return math.sqrt(math.pi * (1 << t) / 2) if k == 1 else math.sqrt(2 * k * (1 << t))
+
+# Distinguished bits and trails per worker so that trails in flight / theta stay well below the expected work
+def parameters(t: int, workers: int) -> tuple:
+    work = expected_evaluations(t)
+    trails = int(min(4096, max(64, 1 << int(math.log2(math.sqrt(work) / 4)))))
+    dbits = max(1, int(math.log2(work / (8 * workers * trails))))
+    return dbits, trails
+
+# Finds collisions of the t-bit truncation of name, returns the report
+def search(t: int = 32, name: str = 'sha3_256', collisions: int = 1, dbits: int = None, trails: int = None,
+           workers: int = None, memory: int = 1 << 20, seed: int = 0, limit: int = None) -> dict:
+    if name not in VARIANTS:
+        raise ValueError("Unknown SHA-3 function {}, expected one of {}".format(name, ', '.join(VARIANTS)))
+    if not 1 <= t <= 64:
+        raise ValueError("Truncation must be 1 to 64 bits, got {}".format(t))
+    workers = workers or os.cpu_count() or 1
+    automatic = parameters(t, workers)
+    dbits = automatic[0] if dbits is None else dbits
+    trails = automatic[1] if trails is None else trails
+    steps = max(16, 1 << dbits)
+    table = PointTable(memory, dbits)
+    logger.info("%s truncated to %d bits: %d workers x %d trails, %d distinguished bits, table of %d slots (%d bytes)",
+                name, t, workers, trails, dbits, table.capacity, table.nbytes)
+
+    seeds = np.random.SeedSequence(seed)
+    found, pairs = [], set()
+    walked = dropped = resolved = robin_hoods = 0
+    begin = time.perf_counter()
+
+    def submit(executor):
+        return executor.submit(walk_task, {'t': t, 'name': name, 'dbits': dbits, 'trails': trails,
+                                           'steps': steps, 'seed': seeds.spawn(1)[0]})
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {submit(executor) for _ in range(workers)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                walked += result['evaluations']
+                dropped += result['dropped']
+                with span('collision.table'):
+                    merges = table.insert(result['points'], result['starts'], result['lengths'])
+
+                with span('collision.resolve'):
+                    for merge in merges:
+                        pair, evaluations = resolve(merge, t, name)
+                        resolved += evaluations
+                        if pair is None:
+                            robin_hoods += 1
+                            continue
+                        x, y = pair
+                        check = truncated_hash(np.array([x, y], dtype=np.uint64), t, name)
+                        if check[0] != check[1]:
+                            raise RuntimeError("Resolved pair {:x}, {:x} does not collide".format(x, y))
+                        if frozenset(pair) not in pairs:
+                            pairs.add(frozenset(pair))
+                            found.append({'x': x, 'y': y, 'image': int(check[0])})
+                            logger.info("Collision %d: f(%x) = f(%x) = %x after %d evaluations",
+                                        len(found), x, y, int(check[0]), walked + resolved)
+
+            finished = len(found) >= collisions or (limit is not None and walked + resolved >= limit)
+            if finished:
+                for future in pending:
+                    future.cancel()
+                pending = set()
+            else:
+                pending |= {submit(executor) for _ in range(len(done))}
+
+    evaluations = walked + resolved
+    expected = expected_evaluations(t, collisions)
+    seconds = time.perf_counter() - begin
+    report = {
+        'name': name,
+        'bits': t,
+        'collisions': found,
+        'evaluations': evaluations,
+        'walkEvaluations': walked,
+        'resolveEvaluations': resolved,
+        'droppedEvaluations': dropped,
+        'expectedEvaluations': expected,
+        'ratio': evaluations / expected,
+        'distinguishedBits': dbits,
+        'trails': trails,
+        'workers': workers,
+        'storedPoints': table.stored,
+        'overwrittenPoints': table.overwritten,
+        'tableBytes': table.nbytes,
+        'failedMerges': robin_hoods,
+        'seconds': seconds,
+        'evaluationsPerSecond': evaluations / seconds if seconds else 0.0,
+    }
+    logger.info("%d collisions in %d evaluations, expected %.0f (ratio %.2f), %.0f evaluations/s",
+                len(found), evaluations, expected, report['ratio'], report['evaluationsPerSecond'])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distinguished point collision search on truncated SHA-3 / SHAKE outputs")
+    parser.add_argument('-t', '--bits', type=int, default=32, help="truncated output bits")
+    parser.add_argument('-a', '--algorithm', choices=list(VARIANTS), default='sha3_256')
+    parser.add_argument('--collisions', type=int, default=1)
+    parser.add_argument('--distinguished-bits', type=int, help="zero low bits of a distinguished point")
+    parser.add_argument('--trails', type=int, help="trails walked together by every worker")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--memory', type=int, default=1 << 20, help="slots of the distinguished point table")
+    parser.add_argument('--limit', type=int, help="stop after this many evaluations")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', help="write the report as JSON")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    report = search(args.bits, args.algorithm, args.collisions, args.distinguished_bits, args.trails,
+                    args.workers, args.memory, args.seed, args.limit)
+    if args.report:
+        writeAtomic(args.report, json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os, sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import span, count
+
+import logging
+
+from keccak_tables import PI_SOURCES, RHO_OFFSETS, VARIANTS, lane_width, round_constants
+
+logger = logging.getLogger(__name__)
+
+"""
+Keccak-p and the SHA-3 functions on many independent states at once with NumPy.
+
+States are (N, 25) arrays of lanes x+5y. The permutation works on chunks transposed to lane-major
+(25, n) so every step is a few whole-row operations: theta XORs the five planes, rho and pi gather
+the rows in PI_SOURCES order and rotate each by its offset, chi combines rows of the same plane.
+Lanes of w bits use the smallest unsigned dtype that holds them, widths below 8 are masked.
+
+Messages of different lengths are bucketed by their number of padded blocks, so every bucket is a
+dense (m, blocks * r) byte array that is padded in place and absorbed block by block.
+"""
+
+# Unsigned dtype holding a lane of w bits
+LANE_DTYPES = {1: np.uint8, 2: np.uint8, 4: np.uint8, 8: np.uint8, 16: np.uint16, 32: np.uint32, 64: np.uint64}
+
+# States permuted together, enough to amortize the NumPy call per step and small enough for the cache
+CHUNK = 1 << 13
+
+# Padded message bytes per chunk, fewer states are taken together when the messages are long
+PADDED_BYTES = 1 << 22
+
+# Rotation of the rows of lane-major lanes by left (array or int), right = (w - left) % w
+def _rotate(lanes: np.ndarray, left, right, mask) -> np.ndarray:
+    rotated = (lanes << left) | (lanes >> right)
+    if mask is not None:
+        rotated &= mask
+    return rotated
+
+# Keccak-p[25w, nr] in place on lane-major states A of shape (25, n)
+def keccak_p_lanes(A: np.ndarray, w: int, nr: int) -> np.ndarray:
+    dtype = LANE_DTYPES[w]
+    mask = dtype((1 << w) - 1) if w < 8 else None
+    offsets = np.array([RHO_OFFSETS[w][s] for s in PI_SOURCES], dtype=dtype)[:, None]
+    complements = (dtype(w) - offsets) % dtype(w)
+    one, back = dtype(1), dtype((w - 1) % w)
+    planes = A.reshape(5, 5, -1)
+    count('keccak.permutations', A.shape[1])
+
+    with span('keccak.batch'):
+        for RC in round_constants(w, nr):
+            # Theta
+            C = planes[0] ^ planes[1]
+            for y in range(2, 5):
+                C ^= planes[y]
+            D = C[[4, 0, 1, 2, 3]] ^ _rotate(C[[1, 2, 3, 4, 0]], one, back, mask)
+            planes ^= D
+
+            # Rho and pi
+            B = _rotate(A[list(PI_SOURCES)], offsets, complements, mask).reshape(5, 5, -1)
+
+            # Chi
+            chi = ~B[:, [1, 2, 3, 4, 0]]
+            chi &= B[:, [2, 3, 4, 0, 1]]
+            chi ^= B
+            if mask is not None:
+                chi &= mask
+            planes[...] = chi
+
+            # Iota
+            A[0] ^= dtype(RC)
+    return A
+
+# Keccak-p[b, nr] on every row of the (N, 25) states, returns a new array
+def keccak_p(states: np.ndarray, b: int = 1600, nr: int = 24, chunk: int = CHUNK) -> np.ndarray:
+    w = lane_width(b)
+    states = np.asarray(states)
+    if states.ndim != 2 or states.shape[1] != 25:
+        raise ValueError("States must have shape (N, 25), got {}".format(states.shape))
+    result = np.empty(states.shape, dtype=LANE_DTYPES[w])
+    for start in range(0, len(states), chunk):
+        A = np.ascontiguousarray(states[start:start + chunk].T, dtype=LANE_DTYPES[w])
+        result[start:start + chunk] = keccak_p_lanes(A, w, nr).T
+    return result
+
+# Flat byte buffer, offsets and lengths of a sequence of bytes-like messages or of the rows of a 2D
+# uint8 buffer (the first lengths[i] bytes of row i when lengths are given)
+def _message_layout(messages, lengths=None) -> tuple:
+    if lengths is not None and isinstance(messages, (list, tuple)):
+        raise ValueError("Lengths only apply to a 2D message buffer, got a {}".format(type(messages).__name__))
+    if isinstance(messages, np.ndarray) or lengths is not None:
+        rows = np.ascontiguousarray(messages, dtype=np.uint8)
+        if rows.ndim != 2:
+            raise ValueError("Message buffer must be 2D, got shape {}".format(rows.shape))
+        n, size = rows.shape
+        lengths = np.full(n, size, dtype=np.int64) if lengths is None else np.asarray(lengths, dtype=np.int64)
+        if len(lengths) != n or (lengths < 0).any() or (lengths > size).any():
+            raise ValueError("Lengths must be one per row and at most {}".format(size))
+        return rows.ravel(), np.arange(n, dtype=np.int64) * size, lengths
+
+    parts = [message.encode('utf-8') if isinstance(message, str) else memoryview(message).cast('B')
+             for message in messages]
+    lengths = np.array([len(part) for part in parts], dtype=np.int64)
+    offsets = np.zeros(len(parts), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    return np.frombuffer(b''.join(parts), dtype=np.uint8), offsets, lengths
+
+# Digests of many messages at once as an (N, d/8) uint8 array, length is the output size of an XOF
+# messages: sequence of bytes-like or str (UTF-8), or an (N, L) uint8 buffer with optional per-row lengths
+# (lengths only apply to a buffer)
+def hash_batch(messages, name: str = 'sha3_256', lengths=None, length: int = None, chunk: int = CHUNK) -> np.ndarray:
+    if name not in VARIANTS:
+        raise ValueError("Unknown SHA-3 function {}, expected one of {}".format(name, ', '.join(VARIANTS)))
+    c, d, suffix = VARIANTS[name]
+    if (d is None) == (length is None):
+        if d is None:
+            raise TypeError("hash_batch() requires an output length for {}".format(name))
+        raise TypeError("hash_batch() takes no output length for fixed-output {}".format(name))
+    size = d // 8 if d is not None else length
+    r = (1600 - c) // 8
+    lanes = r // 8
+
+    flat, offsets, lengths = _message_layout(messages, lengths)
+    output = np.empty((len(lengths), size), dtype=np.uint8)
+    blocks = lengths // r + 1
+    logger.debug("Hashing %d messages with %s in %d buckets", len(lengths), name, len(np.unique(blocks)))
+
+    for bucket_blocks in np.unique(blocks).tolist():
+        bucket = np.flatnonzero(blocks == bucket_blocks)
+        width = bucket_blocks * r
+        columns = np.arange(width, dtype=np.int64)
+        step = max(1, min(chunk, PADDED_BYTES // width))
+        for start in range(0, len(bucket), step):
+            rows = bucket[start:start + step]
+            m = len(rows)
+
+            # P = N || suffix || 0* || 0x80 for every row of the bucket
+            with span('sponge.pad'):
+                inside = columns < lengths[rows, None]
+                padded = np.zeros((m, width), dtype=np.uint8)
+                padded[inside] = flat[(offsets[rows, None] + columns)[inside]]
+                padded[np.arange(m), lengths[rows]] = suffix
+                padded[:, -1] |= 0x80
+                words = padded.view('<u8').reshape(m, bucket_blocks, lanes)
+
+            A = np.zeros((25, m), dtype=np.uint64)
+            with span('sponge.absorb'):
+                for block in range(bucket_blocks):
+                    A[:lanes] ^= words[:, block].T
+                    keccak_p_lanes(A, 64, 24)
+            count('sponge.blocks', m * bucket_blocks)
+
+            with span('sponge.squeeze'):
+                for done in range(0, size, r):
+                    if done:
+                        keccak_p_lanes(A, 64, 24)
+                    take = min(r, size - done)
+                    squeezed = np.ascontiguousarray(A[:lanes].T, dtype='<u8').view(np.uint8)
+                    output[rows, done:done + take] = squeezed[:, :take]
+    return output
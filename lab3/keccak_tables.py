@@ -0,0 +1,75 @@
+from types import MappingProxyType
+
+"""
+Keccak constants shared by every Keccak-p[b, nr] variant, built once at import.
+
+Lanes are indexed x + 5y. For every lane width w in WIDTHS (b = 25w):
+ROUND_CONSTANTS[w][i] is the iota constant of round index i, RC[2^j - 1] = rc(j + 7i) for j <= l.
+rc has period 255, so the table holds 255 constants and round index i reads entry i % 255, which
+covers the negative indices 12+2l-nr of Keccak-p with more than 12+2l rounds.
+RHO_OFFSETS[w][x+5y] is (t+1)(t+2)/2 mod w along (x,y) = (1,0), (y, (2x+3y)%5), ...
+PI_SOURCES[x+5y] is the lane moved to (x,y) by pi, A'[x,y] = A[(x+3y)%5, x], as gather indices.
+RHO_PI[w] holds (destination, source, source column, rotation, w - rotation) for a fused pass.
+VARIANTS lists the FIPS 202 functions on Keccak-f[1600] by name.
+Everything is tuples behind read-only mappings.
+"""
+
+WIDTHS = (1, 2, 4, 8, 16, 32, 64)
+
+# rc(t) for t in 0..254: R = 10000000, shift, and feed R[8] back into R[0], R[4], R[5], R[6]
+def _rc_bits() -> tuple:
+    bits, R = [], 1
+    for t in range(255):
+        bits.append(R & 1)
+        R <<= 1
+        if R & 0x100:
+            R ^= 0x171
+    return tuple(bits)
+
+RC_BITS = _rc_bits()
+
+def _round_constants(w: int) -> tuple:
+    l = w.bit_length() - 1
+    return tuple(sum(RC_BITS[(j + 7*i) % 255] << ((1 << j) - 1) for j in range(l + 1)) for i in range(255))
+
+def _rho_offsets(w: int) -> tuple:
+    offsets = [0] * 25
+    x, y = 1, 0
+    for t in range(24):
+        offsets[x + 5*y] = ((t+1)*(t+2)//2) % w
+        x, y = y, ((2*x)+(3*y))%5
+    return tuple(offsets)
+
+PI_SOURCES = tuple(((x+(3*y))%5) + 5*x for y in range(5) for x in range(5))
+
+ROUND_CONSTANTS = MappingProxyType({w: _round_constants(w) for w in WIDTHS})
+RHO_OFFSETS = MappingProxyType({w: _rho_offsets(w) for w in WIDTHS})
+RHO_PI = MappingProxyType({
+    w: tuple((i, s, s % 5, RHO_OFFSETS[w][s], (w - RHO_OFFSETS[w][s]) % w) for i, s in enumerate(PI_SOURCES))
+    for w in WIDTHS
+})
+
+# Lane width of Keccak-p[b], b = 25w with w a power of two up to 64
+def lane_width(b: int) -> int:
+    w = b // 25
+    if b % 25 or w not in ROUND_CONSTANTS:
+        raise ValueError("Keccak-p width must be 25w for w in {}, got {}".format(WIDTHS, b))
+    return w
+
+# Iota constants of Keccak-p[25w, nr] in round order, round indices 12+2l-nr .. 12+2l-1
+def round_constants(w: int, nr: int) -> tuple:
+    if nr < 0:
+        raise ValueError("Keccak-p round count must not be negative, got {}".format(nr))
+    table = ROUND_CONSTANTS[w]
+    last = 12 + 2*(w.bit_length() - 1)
+    return tuple(table[i % 255] for i in range(last - nr, last))
+
+# Capacity, digest bits (None for an XOF) and domain suffix of the FIPS 202 functions
+VARIANTS = MappingProxyType({
+    'sha3_224': (448, 224, 0x06),
+    'sha3_256': (512, 256, 0x06),
+    'sha3_384': (768, 384, 0x06),
+    'sha3_512': (1024, 512, 0x06),
+    'shake_128': (256, None, 0x1F),
+    'shake_256': (512, None, 0x1F),
+})
@@ -0,0 +1,195 @@
+import argparse, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure, span, count
+from common.files import saveAtomic, writeAtomic
+
+import logging
+
+from keccak_batch import LANE_DTYPES, keccak_p_lanes
+from keccak_tables import WIDTHS, lane_width
+
+logger = logging.getLogger(__name__)
+
+"""
+Statistical analysis of reduced-round Keccak-p[b, nr] on batches of random states.
+
+Bits are numbered like the FIPS 202 state string, bit z of lane x+5y is bit w(x+5y)+z.
+For every configuration (b, nr) random states are drawn in chunks and only histograms are kept:
+avalanche      counts of output bit j flipping when input bit i is flipped, for the chosen input bits
+difference     histogram of the Hamming weight of P(S) ^ P(S ^ delta) and counts per output bit
+avalancheFull is the number of (input bit, output bit) pairs whose flip rate cannot be told from 1/2.
+Chunks are spread over a process pool with seeds spawned from one SeedSequence, so the result only
+depends on the seed, samples and chunk size, not on the number of workers.
+
+The distinguisher compares every output bit of the difference with a fair coin: z = (count - n/2) / sqrt(n/4).
+It fires when max |z| is above the two-sided Bonferroni bound for b bits at FALSE_ALARM, and the chi-square
+sum of z^2 over the b bits is reported next to its b degrees of freedom.
+"""
+
+# States per call of the permutation, input bit flips are stacked up to this many states
+CHUNK = 1 << 14
+
+# Probability that the distinguisher fires on a random permutation
+FALSE_ALARM = 1e-3
+
+# Random lane-major states (25, n) with lanes of w bits
+def random_states(rng: np.random.Generator, w: int, n: int) -> np.ndarray:
+    return rng.integers(0, 1 << w, (25, n), dtype=np.uint64).astype(LANE_DTYPES[w])
+
+# Number of set bits per state bit over the last axis, shape (25, ..., w), and the weights of every column
+def bit_statistics(D: np.ndarray, w: int) -> tuple:
+    counts = np.empty(D.shape[:-1] + (w,), dtype=np.int64)
+    weights = np.zeros(D.shape[1:], dtype=np.int64)
+    one = D.dtype.type(1)
+    for z in range(w):
+        bits = (D >> D.dtype.type(z)) & one
+        counts[..., z] = bits.sum(axis=-1, dtype=np.int64)
+        weights += bits.sum(axis=0, dtype=np.int64)
+    return counts, weights
+
+# Difference as 25 lanes from a list of state bit positions
+def bit_difference(bits: list, w: int) -> tuple:
+    lanes = [0] * 25
+    for bit in bits:
+        if not 0 <= bit < 25 * w:
+            raise ValueError("Bit {} is outside the {}-bit state".format(bit, 25 * w))
+        lanes[bit // w] ^= 1 << (bit % w)
+    return tuple(lanes)
+
+# Worker: histograms of one chunk of random states for configuration (b, nr)
+def analysis_task(task: dict) -> dict:
+    b, nr, n = task['b'], task['nr'], task['count']
+    w = lane_width(b)
+    dtype = LANE_DTYPES[w]
+    rng = np.random.default_rng(task['seed'])
+    S = random_states(rng, w, n)
+    P = keccak_p_lanes(S.copy(), w, nr)
+    result = {}
+
+    # Difference propagation
+    with span('reduced.difference'):
+        T = S.copy()
+        T ^= np.array(task['difference'], dtype=dtype)[:, None]
+        D = keccak_p_lanes(T, w, nr) ^ P
+        counts, weights = bit_statistics(D, w)
+        result['differenceBits'] = counts.reshape(-1)
+        result['weights'] = np.bincount(weights, minlength=b + 1)
+
+    # Avalanche, flipped copies of the chunk are permuted together
+    bits = task['bits']
+    avalanche = np.zeros((len(bits), b), dtype=np.int64)
+    group = max(1, task['stack'] // n)
+    with span('reduced.avalanche'):
+        for start in range(0, len(bits), group):
+            flips = bits[start:start + group]
+            F = np.tile(S, (1, len(flips))).reshape(25, len(flips), n)
+            for k, bit in enumerate(flips):
+                F[bit // w, k] ^= dtype(1 << (bit % w))
+            F = keccak_p_lanes(F.reshape(25, -1), w, nr).reshape(25, len(flips), n)
+            F ^= P[:, None, :]
+            counts, _ = bit_statistics(F, w)
+            avalanche[start:start + len(flips)] = counts.transpose(1, 0, 2).reshape(len(flips), b)
+    result['avalanche'] = avalanche
+    count('reduced.states', n * (len(bits) + 2))
+    return result
+
+# Summary of the merged histograms of n samples
+def summarize(b: int, nr: int, n: int, bits: list, difference: tuple, histograms: dict) -> dict:
+    avalanche = histograms['avalanche'] / n
+    ones = histograms['differenceBits']
+    z = (ones - n / 2) / np.sqrt(n / 4)
+    bound = NormalDist().inv_cdf(1 - FALSE_ALARM / (2 * b))
+    weights = histograms['weights']
+    return {
+        'b': b,
+        'rounds': nr,
+        'samples': n,
+        'avalancheBits': list(bits),
+        'avalancheMean': float(avalanche.mean()) if len(bits) else None,
+        'avalancheWorst': float(np.abs(avalanche - 0.5).max()) if len(bits) else None,
+        'avalancheFull': int(np.count_nonzero(np.abs(avalanche - 0.5) * 2 * np.sqrt(n) < bound)) if len(bits) else None,
+        'difference': [int(lane) for lane in difference],
+        'meanWeight': float(np.dot(np.arange(b + 1), weights) / n),
+        'weightHistogram': weights.tolist(),
+        'maxBias': float(np.abs(ones / n - 0.5).max()),
+        'maxZ': float(np.abs(z).max()),
+        'zBound': bound,
+        'chiSquare': float(np.square(z).sum()),
+        'degreesOfFreedom': b,
+        'distinguished': bool(np.abs(z).max() > bound),
+    }
+
+# Runs every (b, nr) configuration over samples random states, returns the summaries and the avalanche matrices
+def sweep(widths: list, rounds: list, samples: int, difference: list = None, avalanche_bits: int = 64,
+          seed: int = 0, workers: int = None, chunk: int = 1 << 12, stack: int = CHUNK) -> tuple:
+    configurations = [(b, nr) for b in widths for nr in rounds]
+    seeds = np.random.SeedSequence(seed).spawn(len(configurations))
+    tasks, settings = [], {}
+    for (b, nr), configuration_seed in zip(configurations, seeds):
+        w = lane_width(b)
+        bits = sorted(set(np.linspace(0, b - 1, min(avalanche_bits, b)).astype(int).tolist())) if avalanche_bits else []
+        delta = bit_difference(difference if difference is not None else [0], w)
+        settings[b, nr] = (bits, delta)
+        sizes = [min(chunk, samples - start) for start in range(0, samples, chunk)]
+        for size, child_seed in zip(sizes, configuration_seed.spawn(len(sizes))):
+            tasks.append({'b': b, 'nr': nr, 'count': size, 'seed': child_seed, 'bits': bits,
+                          'difference': delta, 'stack': stack})
+    logger.info("%d configurations, %d tasks of up to %d states", len(configurations), len(tasks), chunk)
+
+    merged = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for task, result in zip(tasks, executor.map(analysis_task, tasks)):
+            key = (task['b'], task['nr'])
+            if key not in merged:
+                merged[key] = result
+            else:
+                for name, histogram in result.items():
+                    merged[key][name] += histogram
+
+    summaries, matrices = [], {}
+    for b, nr in configurations:
+        bits, delta = settings[b, nr]
+        summary = summarize(b, nr, samples, bits, delta, merged[b, nr])
+        logger.info("Keccak-p[%d, %d]: avalanche mean %s worst %s, difference weight %.2f, max z %.2f (bound %.2f)%s",
+                    b, nr, summary['avalancheMean'], summary['avalancheWorst'], summary['meanWeight'],
+                    summary['maxZ'], summary['zBound'], ', distinguished' if summary['distinguished'] else '')
+        summaries.append(summary)
+        matrices[b, nr] = merged[b, nr]['avalanche'] / samples
+    return summaries, matrices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avalanche, difference propagation and distinguisher statistics "
+                                                 "of reduced-round Keccak-p[b, nr]")
+    parser.add_argument('--widths', type=int, nargs='+', default=[25 * w for w in WIDTHS])
+    parser.add_argument('--rounds', type=int, nargs='+', default=[1, 2, 3, 4])
+    parser.add_argument('--samples', type=int, default=1 << 14, help="random states per configuration")
+    parser.add_argument('--difference', type=int, nargs='+', metavar='BIT',
+                        help="state bits of the input difference, default bit 0")
+    parser.add_argument('--avalanche-bits', type=int, default=64,
+                        help="input bits flipped for the avalanche matrix, spread over the state, 0 to skip it")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunk', type=int, default=1 << 12, help="states per task")
+    parser.add_argument('--report', help="write the summaries as JSON")
+    parser.add_argument('--matrices', metavar='DIR', help="save every avalanche matrix as DIR/avalanche_b_nr.npy")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    summaries, matrices = sweep(args.widths, args.rounds, args.samples, args.difference, args.avalanche_bits,
+                                args.seed, args.workers, args.chunk)
+    if args.report:
+        writeAtomic(args.report, json.dumps(summaries, indent=2))
+    if args.matrices:
+        os.makedirs(args.matrices, exist_ok=True)
+        for (b, nr), matrix in matrices.items():
+            saveAtomic(os.path.join(args.matrices, 'avalanche_{}_{}.npy'.format(b, nr)), matrix)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import logging
+import mmap, os, sys, struct
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import span, count
+
+from keccak_tables import RHO_PI, VARIANTS, lane_width, round_constants
+
+logger = logging.getLogger(__name__)
+
+"""
+The state is held as 25 lanes of w = b/25 bits, lane x+5y is A[x,y] and bit z of the lane is
+A[x,y,z], which matches the FIPS 202 string layout S[w(5y+x)+z] when lanes are read little endian.
+Round constants, rho offsets and pi sources come from keccak_tables, round ir of Keccak-p[b,nr]
+uses the constant of round 12+2l-nr+ir, so Keccak-f[b] = Keccak-p[b,12+2l].
+
+The permutation of one state is unrolled once per lane width: the source of a function that keeps
+the 25 lanes in local variables and spells out theta, rho and pi, chi and iota with the rotation
+offsets as literals is generated from keccak_tables and compiled on first use. Lanes only need the
+w-bit mask after a rotation, XOR and AND of w-bit values stay within w bits.
+"""
+
+# Lane width in bytes to struct format character
+LANE_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+# Bytes of a mapped file hashed before their pages are dropped again
+FILE_CHUNK = 1 << 26
+
+_PERMUTATIONS = {}
+
+# Rotation of a lane left by n bits in the generated source, the right shift reads the lane as name
+# so expression can assign it with (name := ...)
+def _rotate_source(expression: str, name: str, n: int, w: int) -> str:
+    if n % w == 0:
+        return expression
+    return '(({} << {}) | ({} >> {})) & {}'.format(expression, n, name, w - n, hex((1 << w) - 1))
+
+# Source of Keccak-p on 25 lanes of w bits, permute(A, round_constants) works on the list A in place
+def _permutation_source(w: int) -> str:
+    lanes = ', '.join('a{}'.format(i) for i in range(25))
+    lines = ['def permute(A, round_constants):', '    {} = A'.format(lanes), '    for RC in round_constants:']
+    # Theta, D[x] = C[x-1] ^ rot(C[x+1], 1)
+    for x in range(5):
+        lines.append('        c{} = {}'.format(x, ' ^ '.join('a{}'.format(x + 5*y) for y in range(5))))
+    for x in range(5):
+        c = 'c{}'.format((x + 1) % 5)
+        lines.append('        d{} = c{} ^ ({})'.format(x, (x - 1) % 5, _rotate_source(c, c, 1, w)))
+    # Rho and pi, B[destination] = rot(A[source] ^ D[column], offset)
+    for destination, source, column, left, _ in RHO_PI[w]:
+        lane = 'a{} ^ d{}'.format(source, column)
+        if left:
+            lane = _rotate_source('(v := {})'.format(lane), 'v', left, w)
+        lines.append('        b{} = {}'.format(destination, lane))
+    # Chi and iota
+    for y in range(0, 25, 5):
+        for x in range(5):
+            lines.append('        a{} = b{} ^ (~b{} & b{}){}'.format(y + x, y + x, y + (x + 1) % 5, y + (x + 2) % 5,
+                                                                 ' ^ RC' if y + x == 0 else ''))
+    lines += ['    A[:] = ({},)'.format(lanes), '    return A']
+    return '\n'.join(lines) + '\n'
+
+# Unrolled Keccak-p for lanes of w bits, compiled once per width
+def permutation(w: int):
+    if w not in _PERMUTATIONS:
+        namespace = {}
+        exec(compile(_permutation_source(w), '<keccak-p[{}]>'.format(25 * w), 'exec'), namespace)
+        _PERMUTATIONS[w] = namespace['permute']
+    return _PERMUTATIONS[w]
+
+# Sha-3 algorithm as a hashlib-style object: update(), digest(), hexdigest(), copy()
+# Keccak[c] sponge over Keccak-p[b,nr] with a d-bit digest, suffix holds the domain bits followed by the first pad bit
+# d = None makes an XOF: digest(length) and read(n), which squeezes the output incrementally
+class SHA3():
+    # Initialize the class, data is absorbed right away
+    def __init__(self, data=None, c: int = 512, f: list = [1600,24], d: int = 256, suffix: int = 0x06,
+                 name: str = 'sha3_256') -> None:
+        b, nr = f[0], f[1]
+        lane, r = lane_width(b) // 8, (b - c) // 8
+        if lane not in LANE_FORMATS or r <= 0 or (b - c) % (8 * lane) or (d is not None and d % 8):
+            raise ValueError("Sponge needs byte lanes, a rate of whole lanes and a digest of whole bytes, "
+                             "got b = {}, c = {}, d = {}".format(b, c, d))
+
+        self.name = name
+        self.digest_size = d // 8 if d is not None else 0
+        self.block_size = r
+        self.xof = d is None
+        self.__b, self.__suffix = b, suffix
+        self.__permute = permutation(lane_width(b))
+        self.__round_constants = round_constants(lane_width(b), nr)
+        self.__block = struct.Struct('<{}{}'.format(r // lane, LANE_FORMATS[lane]))
+        self.__state = [0] * 25
+        self.__buffer = bytearray()
+        # Squeezed state and the unread rest of its output block once read() started
+        self.__output = None
+        if data is not None:
+            self.update(data)
+
+    # Keccak-p[b,nr] on the lane list A in place
+    def __keccak_p(self, A: list) -> list:
+        count('keccak.permutations')
+        with span('keccak.permutation'):
+            return self.__permute(A, self.__round_constants)
+
+    # XORs every whole r-byte block of blocks into the lanes S, each followed by Keccak-p
+    def __absorb(self, S: list, blocks):
+        n = 0
+        with span('sponge.absorb'):
+            for values in self.__block.iter_unpack(blocks):
+                for j, value in enumerate(values):
+                    S[j] ^= value
+                self.__keccak_p(S)
+                n += 1
+        count('sponge.blocks', n)
+
+    # Let Z = Trunc(S,r), then Z = Z || Trunc(f(S),r) until |Z| >= n
+    # pending is the unread rest of the last output block, None before the first one
+    # Returns n bytes and the new pending bytes, S is left at the last output block
+    def __squeeze(self, S: list, n: int, pending: bytes = None) -> tuple:
+        block, lanes = self.__block, self.__block.size // (self.__b // 200)
+        if pending is None:
+            pending = block.pack(*S[:lanes])
+        Z = bytearray(pending[:n])
+        pending = pending[n:]
+        with span('sponge.squeeze'):
+            while len(Z) < n:
+                self.__keccak_p(S)
+                output = block.pack(*S[:lanes])
+                take = n - len(Z)
+                Z += output[:take]
+                pending = output[take:]
+        return bytes(Z), pending
+
+    # Absorbs the padded last block into a copy of the state
+    def __finish(self) -> list:
+        S = self.__state.copy()
+        P = bytearray(self.__buffer)
+        P.append(self.__suffix)
+        P.extend(bytes(-len(P) % self.block_size))
+        P[-1] |= 0x80
+        self.__absorb(S, P)
+        return S
+
+    # Absorbs any bytes-like object, whole blocks are read from the caller's buffer without a copy
+    # and only the tail shorter than a block is kept until the next update
+    def update(self, data) -> None:
+        if self.__output is not None:
+            raise ValueError("{} cannot absorb more data after read()".format(self.name))
+        view = memoryview(data).cast('B')
+        r, buffer = self.block_size, self.__buffer
+        start = 0
+        if buffer:
+            start = min(r - len(buffer), len(view))
+            buffer += view[:start]
+            if len(buffer) < r:
+                return
+            self.__absorb(self.__state, bytes(buffer))
+            buffer.clear()
+
+        end = start + (len(view) - start) // r * r
+        if end > start:
+            self.__absorb(self.__state, view[start:end])
+        buffer += view[end:]
+
+    # Let P = N || suffix || pad10*1(r, len(N)), the last block is padded on a copy of the state
+    # so the object can still be updated after a digest, an XOF needs the output length in bytes
+    def digest(self, length: int = None) -> bytes:
+        if self.xof == (length is None):
+            if self.xof:
+                raise TypeError("digest() requires a length for {}".format(self.name))
+            raise TypeError("digest() takes no length for fixed-output {}".format(self.name))
+        return self.__squeeze(self.__finish(), self.digest_size or length)[0]
+
+    def hexdigest(self, length: int = None) -> str:
+        return self.digest(length).hex()
+
+    # Next n bytes of XOF output, only the blocks they need are squeezed
+    def read(self, n: int) -> bytes:
+        if not self.xof:
+            raise TypeError("{} is not an XOF".format(self.name))
+        if self.__output is None:
+            self.__output = (self.__finish(), None)
+        S, pending = self.__output
+        Z, pending = self.__squeeze(S, n, pending)
+        self.__output = (S, pending)
+        return Z
+
+    # Independent object with the same absorbed data
+    def copy(self) -> 'SHA3':
+        other = SHA3.__new__(SHA3)
+        other.__dict__.update(self.__dict__)
+        other.__state = self.__state.copy()
+        other.__buffer = self.__buffer.copy()
+        if self.__output is not None:
+            other.__output = (self.__output[0].copy(), self.__output[1])
+        return other
+
+    # Sha 3-256 execution
+    @staticmethod
+    def sha3_256(message: str) -> str:
+        logger.debug("Executing sha3-256 on message of length %d", len(message))
+
+        # Absorb the UTF-8 bytes and convert the digest to hexadecimal string
+        return SHA3(message.encode('utf-8')).hexdigest()
+
+# hashlib-style constructors
+def new(name: str, data=None) -> SHA3:
+    if name not in VARIANTS:
+        raise ValueError("Unknown SHA-3 function {}, expected one of {}".format(name, ', '.join(VARIANTS)))
+    c, d, suffix = VARIANTS[name]
+    return SHA3(data, c=c, d=d, suffix=suffix, name=name)
+
+def sha3_224(data=None) -> SHA3:
+    return new('sha3_224', data)
+
+def sha3_256(data=None) -> SHA3:
+    return new('sha3_256', data)
+
+def sha3_384(data=None) -> SHA3:
+    return new('sha3_384', data)
+
+def sha3_512(data=None) -> SHA3:
+    return new('sha3_512', data)
+
+def shake_128(data=None) -> SHA3:
+    return new('shake_128', data)
+
+def shake_256(data=None) -> SHA3:
+    return new('shake_256', data)
+
+# Hashes a file through mmap in constant memory, pages of every FILE_CHUNK bytes are dropped once absorbed
+# hash is updated and returned, a new SHA3-256 object by default
+def file_digest(path: str, hash: SHA3 = None) -> SHA3:
+    hash = SHA3() if hash is None else hash
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        logger.debug("Hashing %s, %d bytes", path, size)
+        if size == 0:
+            return hash
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mapped) as view:
+                for start in range(0, size, FILE_CHUNK):
+                    with view[start:start + FILE_CHUNK] as chunk:
+                        hash.update(chunk)
+                    if hasattr(mmap, 'MADV_DONTNEED'):
+                        mapped.madvise(mmap.MADV_DONTNEED, start, min(FILE_CHUNK, size - start))
+    return hash
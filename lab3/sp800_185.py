@@ -0,0 +1,188 @@
+import argparse, mmap, os, sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import addArguments, configure, span, count
+
+import logging
+
+from keccak_batch import hash_batch
+from sha3 import SHA3
+
+logger = logging.getLogger(__name__)
+
+"""
+cSHAKE and ParallelHash from NIST SP 800-185 on top of the lab3 sponge.
+
+cSHAKE[c](X, L, N, S) = Keccak[c](bytepad(encode_string(N) || encode_string(S), rate) || X || 00, L),
+which is SHAKE when N and S are both empty.
+ParallelHash splits X into n blocks of B bytes. Every block is a leaf hashed with cSHAKE[c]
+(empty N and S) to a chaining value of 2 * security bits, and the final node is
+    cSHAKE[c](left_encode(B) || CV_0 || ... || CV_n-1 || right_encode(n) || right_encode(L), L, "ParallelHash", S)
+with L = 0 for ParallelHashXOF.
+
+Leaves are hashed in a process pool. Workers map the input file once (or inherit the bytes on fork)
+and each task hashes a run of consecutive leaves as one batch with keccak_batch.hash_batch.
+The chaining values come back in order, so the result does not depend on workers or chunk.
+Lengths are given in bytes like hashlib, L in the encodings is in bits.
+"""
+
+# (X, B, L bytes, S, security, xof, digest) from the SP 800-185 ParallelHash examples
+TEST_VECTORS = [
+    (bytes.fromhex('000102030405060710111213141516172021222324252627'), 8, 32, b'', 128, False,
+     'ba8dc1d1d979331d3f813603c67f72609ab5e44b94a0b8f9af46514454a2b4f5'),
+    (bytes.fromhex('000102030405060710111213141516172021222324252627'), 8, 32, b'Parallel Data', 128, False,
+     'fc484dcb3f84dceedc353438151bee58157d6efed0445a81f165e495795b7206'),
+    (bytes.fromhex('000102030405060710111213141516172021222324252627'), 8, 64, b'', 256, False,
+     'bc1ef124da34495e948ead207dd9842235da432d2bbc54b4c110e64c451105531b7f2a3e0ce055c02805e7c2de1fb746af97a1dd01f43b824e31b87612410429'),
+    (bytes.fromhex('000102030405060710111213141516172021222324252627'), 8, 32, b'', 128, True,
+     'fe47d661e49ffe5b7d999922c062356750caf552985b8e8ce6667f2727c3c8d3'),
+]
+
+# Capacity of cSHAKE128 and cSHAKE256
+CAPACITIES = {128: 256, 256: 512}
+
+# Bytes of input per leaf task
+CHUNK = 1 << 24
+
+# x as its byte length followed by the big-endian bytes, 0 <= x < 2^2040
+def left_encode(x: int) -> bytes:
+    data = x.to_bytes(max(1, (x.bit_length() + 7) // 8), 'big')
+    return bytes([len(data)]) + data
+
+# x as its big-endian bytes followed by their length
+def right_encode(x: int) -> bytes:
+    data = x.to_bytes(max(1, (x.bit_length() + 7) // 8), 'big')
+    return data + bytes([len(data)])
+
+# Bit length of the string followed by the string
+def encode_string(s: bytes) -> bytes:
+    return left_encode(8 * len(s)) + s
+
+# left_encode(w) || X padded with zeros to a multiple of w bytes
+def bytepad(x: bytes, w: int) -> bytes:
+    data = left_encode(w) + x
+    return data + bytes(-len(data) % w)
+
+# cSHAKE with the given security as a SHA3 XOF object, function_name and customization are bytes or str
+def cshake(security: int, data=None, function_name=b'', customization=b'') -> SHA3:
+    if security not in CAPACITIES:
+        raise ValueError("cSHAKE security must be one of {}, got {}".format(tuple(CAPACITIES), security))
+    N = function_name.encode('utf-8') if isinstance(function_name, str) else bytes(function_name)
+    S = customization.encode('utf-8') if isinstance(customization, str) else bytes(customization)
+    c = CAPACITIES[security]
+    if not N and not S:
+        hash = SHA3(c=c, d=None, suffix=0x1F, name='shake_{}'.format(security))
+    else:
+        hash = SHA3(c=c, d=None, suffix=0x04, name='cshake{}'.format(security))
+        hash.update(bytepad(encode_string(N) + encode_string(S), hash.block_size))
+    if data is not None:
+        hash.update(data)
+    return hash
+
+def cshake_128(data=None, function_name=b'', customization=b'') -> SHA3:
+    return cshake(128, data, function_name, customization)
+
+def cshake_256(data=None, function_name=b'', customization=b'') -> SHA3:
+    return cshake(256, data, function_name, customization)
+
+
+_source = None
+
+# Worker: the whole input as a uint8 array, a mapped file or bytes inherited from the parent
+def _init_worker(source):
+    global _source
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        source = mapped
+    _source = np.frombuffer(source, dtype=np.uint8)
+
+# Worker: chaining values of the leaves of B bytes in [start, end) of the input, concatenated
+def _leaf_task(task: tuple) -> bytes:
+    start, end, B, security = task
+    data = _source[start:end]
+    full = len(data) // B
+    name, size = 'shake_{}'.format(security), security // 4
+    values = [hash_batch(data[:full * B].reshape(full, B), name, length=size)] if full else []
+    if len(data) % B:
+        values.append(hash_batch([data[full * B:]], name, length=size))
+    return b''.join(value.tobytes() for value in values)
+
+# Hashes the leaves of source (bytes-like or a file path) of size bytes and finishes the node
+def _parallel_hash(source, size: int, B: int, length: int, S, security: int, xof: bool,
+                   workers: int, chunk: int) -> bytes:
+    if B <= 0:
+        raise ValueError("Block size must be positive, got {}".format(B))
+    n = (size + B - 1) // B
+    step = max(1, chunk // B) * B
+    tasks = [(start, min(start + step, size), B, security) for start in range(0, size, step)]
+    logger.debug("ParallelHash%d of %d bytes: %d leaves in %d tasks", security, size, n, len(tasks))
+
+    node = cshake(security, left_encode(B), 'ParallelHash', S)
+    if tasks:
+        with span('parallel.leaves'):
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source,)) as executor:
+                for values in executor.map(_leaf_task, tasks):
+                    node.update(values)
+        count('parallel.leaves', n)
+
+    node.update(right_encode(n) + right_encode(0 if xof else 8 * length))
+    return node.digest(length)
+
+# ParallelHash128/256 (or ParallelHashXOF) of a bytes-like object, length output bytes, B bytes per leaf
+def parallel_hash(data, block_size: int = 8192, length: int = 32, customization=b'', security: int = 128,
+                  xof: bool = False, workers: int = None, chunk: int = CHUNK) -> bytes:
+    data = memoryview(data).cast('B')
+    source = data.obj if isinstance(data.obj, bytes) and len(data.obj) == len(data) else data.tobytes()
+    return _parallel_hash(source, len(data), block_size, length, customization, security, xof, workers, chunk)
+
+# ParallelHash of a file, every worker maps it read-only once
+def parallel_hash_file(path: str, block_size: int = 8192, length: int = 32, customization=b'', security: int = 128,
+                       xof: bool = False, workers: int = None, chunk: int = CHUNK) -> bytes:
+    path = os.path.abspath(path)
+    return _parallel_hash(path, os.path.getsize(path), block_size, length, customization, security, xof,
+                          workers, chunk)
+
+# Checks parallel_hash against the SP 800-185 examples, returns the number of mismatches
+def check_vectors(workers: int = None) -> int:
+    failed = 0
+    for X, B, length, S, security, xof, expected in TEST_VECTORS:
+        result = parallel_hash(X, B, length, S, security, xof, workers).hex()
+        if result != expected:
+            logger.error("ParallelHash%s%d B = %d, S = %r: got %s, expected %s",
+                         'XOF' if xof else '', security, B, S, result, expected)
+            failed += 1
+    logger.info("%d of %d ParallelHash test vectors match", len(TEST_VECTORS) - failed, len(TEST_VECTORS))
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="SP 800-185 ParallelHash of files with leaves hashed in a process pool")
+    parser.add_argument('files', nargs='*', help="files to hash, every worker maps them read-only")
+    parser.add_argument('-B', '--block-size', type=int, default=8192, help="bytes per leaf")
+    parser.add_argument('--length', type=int, default=None, help="output bytes, default 2 * security bits")
+    parser.add_argument('--customization', default='', help="customization string S")
+    parser.add_argument('--security', type=int, choices=sorted(CAPACITIES), default=128)
+    parser.add_argument('--xof', action='store_true', help="ParallelHashXOF")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunk', type=int, default=CHUNK, help="input bytes per task")
+    parser.add_argument('--vectors', action='store_true', help="check the SP 800-185 examples first")
+    addArguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    if args.vectors and check_vectors(args.workers):
+        sys.exit(1)
+
+    length = args.length or args.security // 4
+    for fileName in args.files:
+        digest = parallel_hash_file(fileName, args.block_size, length, args.customization, args.security,
+                                    args.xof, args.workers, args.chunk)
+        logger.info("%s  %s", digest.hex(), fileName)
+
+if __name__ == "__main__":
+    main()
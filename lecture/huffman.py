@@ -1,7 +1,10 @@
 import logging
+import os, sys
 
-#logging configuration 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import setup, span
+
+logger = logging.getLogger(__name__)
 
 class Node:
     def __init__(self, freq: float, symbol: str, left=None, right=None):
@@ -28,14 +31,16 @@ def huffman(text: str) -> str:
         nodes.append(Node(freq, symbol))
 
     # Create tree and keys based on that
-    root = createTree(nodes)
-    keys = huffmanKeys(root, {}, '')
+    with span('huffman.tree'):
+        root = createTree(nodes)
+        keys = huffmanKeys(root, {}, '')
 
-    logging.info("Huffman keys: %s", keys)
+    logger.debug("Huffman keys: %s", keys)
     
-    result = ''
-    for c in text:
-        result += keys[c]
+    with span('huffman.encode'):
+        result = ''
+        for c in text:
+            result += keys[c]
 
     return result
 
@@ -77,7 +82,7 @@ class Symbol:
 
 # Huffman coding using table instead of tree
 def huffmanTable(text: str) -> str:
-    logging.info("Huffman coding in table")
+    logger.debug("Huffman coding in table")
 
     # Create frequency table
     freq = {}
@@ -112,7 +117,7 @@ def huffmanTable(text: str) -> str:
                 table[i2].link = lastLink
                 table.append(Symbol(None, probSum, 1, lastLink))
         
-    logging.info("Huffman table: %s", table)
+    logger.debug("Huffman table: %s", table)
 
     codes = {}
     for i in range(len(table)):
@@ -125,7 +130,7 @@ def huffmanTable(text: str) -> str:
                 code += str(table[index].p)
                 index = table[index].link
             codes[table[i].symbol] = code  
-    logging.info("Huffman codes: %s", codes)
+    logger.debug("Huffman codes: %s", codes)
 
     result = ''
     for c in text:
@@ -134,13 +139,15 @@ def huffmanTable(text: str) -> str:
     return result
 
 def main():
-    logging.info("Main function")
+    setup("Huffman coding of a sample text")
+    logger.info("Main function")
 
     input_text = 'Hello World!'
     encoded = huffman(input_text)
-    logging.info("Orginal:[%s] Encoded: [%s]", input_text, encoded)
-    encoded = huffmanTable(input_text)
-    logging.info("Orginal:[%s] Encoded: [%s]", input_text, encoded)
+    logger.info("Orginal:[%s] Encoded: [%s]", input_text, encoded)
+    with span('huffman.table'):
+        encoded = huffmanTable(input_text)
+    logger.info("Orginal:[%s] Encoded: [%s]", input_text, encoded)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,12 @@
 import numpy as np
 
 import logging
+import os, sys
 
-#logging configuration 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import setup, count
+
+logger = logging.getLogger(__name__)
 
 """
 Polynomial in array form:
@@ -14,22 +17,25 @@ an*x^n + an-1*x^(n-1) + ... + a0
 
 # Polynomial Euclid algorithm for finding gcd
 def polynomial_gcd(px: list, gx: list) -> list:
-    logging.info("polynomial_gcd, px: {}, gx: {}".format(px, gx))
+    logger.debug("polynomial_gcd, px: %s, gx: %s", px, gx)
     
     qx, rx = polynomial_division(px, gx)
+    calls = 1
     while True:
         qx, rx = polynomial_division(px, gx)
+        calls += 1
         l_gx = len(gx)
         l_rx = len(rx)
         if l_rx > 1 and l_gx >= l_rx:
             px = gx
             gx = rx
         else:
+            count('polynomial_division.calls', calls)
             return gx
 
 # Polynomial division
 def polynomial_division(px: list, gx: list) -> list:
-    logging.info("polynomial_division, px: {}, gx: {}".format(px, gx))
+    logger.debug("polynomial_division, px: %s, gx: %s", px, gx)
 
     qx = []
 
@@ -51,18 +57,19 @@ def polynomial_division(px: list, gx: list) -> list:
 
         px = rx
         if len(rx) < len(gx):
-            logging.info("qx: {} rx: {}".format(qx,rx))
+            logger.debug("qx: %s rx: %s", qx, rx)
             return qx, rx
 
 
 def main():
-    logging.info("Main")
+    setup("Polynomial GCD")
+    logger.info("Main")
 
     px = [1, 0, 1, 0, -3, -3, 8, 2, -5]
     gx = [3, 0, 5, 0, -4, -9, 21]
 
     gcd = polynomial_gcd(px, gx)
-    logging.info("gcd: {}".format(gcd))
+    logger.info("gcd: %s", gcd)
 
 
 if __name__ == '__main__':
@@ -1,9 +1,12 @@
 import numpy as np
 
 import logging
+import os, sys
 
-#logging configuration 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import setup, count
+
+logger = logging.getLogger(__name__)
 
 """
 Polynomial in array form:
@@ -14,20 +17,23 @@ an*x^n + an-1*x^(n-1) + ... + a0
 
 # Polynomial Euclid algorithm for finding gcd (mod)
 def polynomial_gcd_mod(px: list, gx: list, mod: int) -> list:
-    logging.info("polynomial_gcd_mod, px: {}, gx: {}, mod: {}".format(px, gx, mod))
+    logger.debug("polynomial_gcd_mod, px: %s, gx: %s, mod: %d", px, gx, mod)
+    calls = 0
     while True:
         qx, rx = pol_div_mod(px, gx, mod)
+        calls += 1
         l_gx = len(gx)
         l_rx = len(rx)
         if l_rx > 1 and l_gx >= l_rx:
             px = gx
             gx = rx
         else:
+            count('pol_div_mod.calls', calls)
             return qx
 
 # Polynomial division (mod)
 def pol_div_mod(px: list, gx: list, mod: int) -> list:
-    logging.info("pol_div_mod, px: {}, gx: {}, mod: {}".format(px, gx, mod))
+    logger.debug("pol_div_mod, px: %s, gx: %s, mod: %d", px, gx, mod)
     qx = []
 
     while True:
@@ -64,13 +70,14 @@ def pol_div_mod(px: list, gx: list, mod: int) -> list:
 
 
 def main():
-    logging.info("Main")
+    setup("Polynomial GCD modulo a number")
+    logger.info("Main")
 
     px = [1, 0, -4, 0, 0, -1, 0, 4]
     gx = [1, -4, -1, 0, 4]
 
     gcd = polynomial_gcd_mod(px, gx, 2)
-    logging.info("gcd: {}".format(gcd))
+    logger.info("gcd: %s", gcd)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file